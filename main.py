@@ -1,25 +1,40 @@
 #!/usr/bin/python3
+import time, sys
+LAUNCH_TIME = time.perf_counter()
+# must be enabled before any other import to time them
+if "--profile-startup" in sys.argv:
+    from src.shared import startup_profile
+    startup_profile.enable(LAUNCH_TIME)
+# pyglet windows are offscreen only if set before psychopy imports them
+if "--headless" in sys.argv:
+    import pyglet
+    pyglet.options["headless"] = True
+
 from subprocess import Popen
 
-import os, sys, importlib
+import os, importlib
 import itertools
 from collections.abc import Iterable, Iterator
 
 from src.shared import config
-from src.shared import parser, screen
-from src.shared.didyoumean import suggest_session_tasks
+from src.shared import parser, screen, session_catalog, startup_profile
 
 
 def run(parsed):
     # initializing the screen need to be done before loading any psychopy
-    if not parsed.no_force_resolution:
+    if not parsed.no_force_resolution and not parsed.headless:
         screen.init_exp_screen()
-    try:
-        ses_mod = importlib.import_module('src.sessions.ses-%s'%parsed.tasks)
-        tasks = ses_mod.get_tasks(parsed) if hasattr(ses_mod, 'get_tasks') else ses_mod.TASKS
-    except ImportError:
-        suggestion = suggest_session_tasks(parsed.tasks)
+    catalog = session_catalog.load()
+    if parsed.tasks not in catalog:
+        from src.shared.didyoumean import suggest_session_tasks
+        suggestion = suggest_session_tasks(parsed.tasks, list(catalog))
         raise(ValueError('session tasks file cannot be found for %s. Did you mean %s ?'%(parsed.tasks, suggestion)))
+    session = catalog[parsed.tasks]
+    print('session %s: %s, requires %s'%(
+        parsed.tasks, ', '.join(session['task_classes']), ', '.join(session['dependencies'])))
+    with startup_profile.span('import %s'%session['module']):
+        ses_mod = importlib.import_module(session['module'])
+    tasks = ses_mod.get_tasks(parsed) if hasattr(ses_mod, 'get_tasks') else ses_mod.TASKS
     from src.shared import cli
     if parsed.skip_n_tasks:
         if isinstance(tasks, Iterator):
@@ -47,9 +62,12 @@ def run(parsed):
             parsed.skip_soundcheck,
             parsed.target_ETcalibration,
             parsed.validate_ET,
+            et_listener_process=parsed.et_listener_process,
+            launch_time=LAUNCH_TIME,
+            headless=parsed.headless,
             )
     finally:
-        if not parsed.no_force_resolution:
+        if not parsed.no_force_resolution and not parsed.headless:
             screen.reset_exp_screen()
 
 def run_profiled(parsed):
@@ -62,9 +80,21 @@ def run_profiled(parsed):
         "task_stimuli.pstats"
     )
 
+def run_profiled_startup(parsed):
+    try:
+        run(parsed)
+    finally:
+        session = session_catalog.load().get(parsed.tasks, {})
+        startup_profile.get_profiler().save(
+            startup_profile.REPORT_FILE,
+            ['src.shared.cli', 'src.shared.eyetracking', session.get('module')]
+            + session.get('task_modules', []))
+
 if __name__ == "__main__":
     parsed = parser.parse_args()
     if parsed.profile:
         run_profiled(parsed)
+    elif parsed.profile_startup:
+        run_profiled_startup(parsed)
     else:
         run(parsed)
@@ -115,6 +115,52 @@ def repeat_gifs(path_to_gifs = VIDEOS_PATH, new_path_to_gifs=REPEATED_VIDEOS_PAT
                 shutil.copy(path_gif, new_path_gif, follow_symlinks=False)
 
 
+def _run_splits(csum, target_run_num):
+    """Split candidate orders (one per row of csum) into runs of similar durations.
+
+    returns whether each candidate could be split and the index of the last
+    trial of each run, searched in all candidates at once.
+    """
+    import numpy as np
+
+    rows = np.arange(len(csum))
+    valid = np.ones(len(csum), dtype=bool)
+    splits = np.empty((len(csum), target_run_num), dtype=int)
+    last_split = np.zeros(len(csum))
+    # search for splits close to ideal splits
+    for sp in range(target_run_num-1):
+        cond = np.abs(csum-last_split[:, np.newaxis]-TARGET_GIFS_DURATION)
+        valid &= (cond<RUN_DURATION_THR).any(axis=1)
+        splits[:, sp] = cond.argmin(axis=1)
+        last_split = csum[rows, splits[:, sp]]
+    # check last split
+    valid &= np.abs(csum[:, -1] - last_split-TARGET_GIFS_DURATION) <= RUN_DURATION_THR
+    splits[:, -1] = csum.shape[1]-1
+    return valid, splits
+
+
+def _evaluate_seeds(seeds, durations, itis, features, target_run_num):
+    """First of seeds with a gifs order that splits into runs close to the
+    target duration, each run sampling the distribution of all dimensions."""
+    import numpy as np
+    from scipy.stats import ks_2samp
+
+    # same orders as `gifs_list.sample(frac=1)` after `np.random.seed(seed)`
+    orders = np.stack([np.random.RandomState(seed).permutation(len(durations)) for seed in seeds])
+    csum = np.cumsum(durations[orders] + itis[orders], axis=1) - itis[orders]
+    valid, splits = _run_splits(csum, target_run_num)
+
+    for ci in np.flatnonzero(valid):
+        runs = np.split(orders[ci], splits[ci, :-1]+1)
+        if all(
+            ks_2samp(features[run, di], features[:, di])[1] >= 0.05
+            for run in runs
+            for di in range(features.shape[1])
+        ):
+            return seeds[ci]
+    return None
+
+
 def generate_design_file():
     """
     Generate design files comprising the content of each run
@@ -122,9 +168,8 @@ def generate_design_file():
 
     import pandas as pd
     import numpy as np
-    import random
-    import math
-    from scipy.stats import geom, ks_2samp
+    from scipy.stats import geom
+    from ..shared import design_search
 
     gifs_list = pd.read_csv(
         os.path.join(EMOTION_DATA_PATH, "emotionvideos_path_fmri.csv")
@@ -138,49 +183,27 @@ def generate_design_file():
     target_run_num = int(np.round(tot_gif_dur/TARGET_GIFS_DURATION))
     print(f"total_duration {tot_gif_dur}, aiming for {target_run_num} runs of {tot_gif_dur/target_run_num}")
 
-    # try that a bunch of times
-    for i in range(MAGIC_SEED, 1000000):
-        #randomize
-        np.random.seed(i)
-        gifs_rand = gifs_list.sample(frac=1).reset_index()
-        csum = np.asanyarray((gifs_rand.total_duration + gifs_rand.iti).cumsum() - gifs_rand.iti)
-
-        splits=[]
-        last_split = 0
-        # search for splits close to ideal splits
-        fail = False
-        for sp in range(target_run_num-1):
-            cond = np.abs(csum-last_split-TARGET_GIFS_DURATION)
-            if not any(cond<RUN_DURATION_THR):
-                fail = True
-                break
-            splits.append(np.argmin(cond))
-            last_split = csum[splits[-1]]
-        if fail:
-            # abort not found
-            #print(f'fail {sp}')
-            continue
-        # check last split
-        if np.abs(csum[-1] - last_split-TARGET_GIFS_DURATION) > RUN_DURATION_THR:
-            continue
-        splits.append(len(gifs_rand)-1)
-
-        start = 0
-        last_split = 0
-        for run_id, split in enumerate(splits):
-            gifs_run = gifs_rand[start:split+1]
-            for dimension in dimensions:
-                ks_val, ks_p = ks_2samp(gifs_run[dimension], gifs_list[dimension])
-                if ks_p < 0.05:
-                    print(ks_p)
-                    fail = True
-                    break
-            start=split+1
-        if fail:
-            continue
-
-        print(f"found design at iteration {i}") #yeahhhh!
-        break
+    # search seeds in parallel, the lowest seed satisfying the constraints is kept
+    seed = design_search.search(
+        _evaluate_seeds,
+        MAGIC_SEED,
+        1000000,
+        args=(
+            gifs_list.total_duration.to_numpy(dtype=float),
+            gifs_list.iti.to_numpy(dtype=float),
+            gifs_list[dimensions].to_numpy(dtype=float),
+            target_run_num,
+        ),
+    )
+    if seed is None:
+        raise RuntimeError("no design satisfying the constraints was found")
+    print(f"found design with seed {seed}") #yeahhhh!
+
+    np.random.seed(seed)
+    gifs_rand = gifs_list.sample(frac=1).reset_index()
+    csum = np.asanyarray((gifs_rand.total_duration + gifs_rand.iti).cumsum() - gifs_rand.iti)
+    _, splits = _run_splits(csum[np.newaxis], target_run_num)
+    splits = splits[0].tolist()
     print(gifs_rand.shape)
     print(splits[-1])
 
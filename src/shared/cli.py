@@ -4,6 +4,7 @@ import os, datetime, traceback, glob, time
 from collections.abc import Iterable, Iterator
 from psychopy import core, visual, logging, event
 import itertools
+import functools
 
 visual.window.reportNDroppedFrames = 10e10
 
@@ -14,8 +15,16 @@ globalClock = core.MonotonicClock(0)
 logging.setDefaultClock(globalClock)
 
 from . import config  # import first separately
-from . import fmri, eyetracking, utils, meg, eeg, config
-from ..tasks import task_base, video
+from . import fmri, utils, meg, eeg, config, event_writer, startup_profile
+from ..tasks import task_base
+# eyetracking (zmq, msgpack) and video are only imported by sessions using them
+
+
+def _log_time_to_first_frame(launch_time):
+    time_to_first_frame = time.perf_counter() - launch_time
+    startup_profile.mark("first_frame")
+    logging.exp(f"time to first frame: {time_to_first_frame:.3f}s")
+    print(f"time to first frame: {time_to_first_frame:.3f}s")
 
 
 def listen_shortcuts():
@@ -85,6 +94,7 @@ def run_task(
             shortcut_evt = run_task_loop(
                 task,
                 task.run(exp_win, ctl_win),
+                exp_win,
                 eyetracker,
                 gaze_drawer,
                 record_movie=exp_win if record_movie else False,
@@ -134,6 +144,9 @@ def main_loop(
     skip_soundcheck=False,
     calibration_targets=False,
     validate_eyetrack=False,
+    et_listener_process=False,
+    launch_time=None,
+    headless=None,
 ):
 
     # force screen resolution to solve issues with video splitter at scanner
@@ -161,11 +174,22 @@ def main_loop(
     logfile_path = os.path.join(log_path, log_name_prefix + ".log")
     log_file = logging.LogFile(logfile_path, level=logging.INFO, filemode="w")
 
-    exp_win = visual.Window(**config.EXP_WINDOW, monitor=config.EXP_MONITOR)
+    if headless:
+        from . import headless as headless_window
+        Window = functools.partial(headless_window.HeadlessWindow, vsync=headless == "vsync")
+    else:
+        Window = visual.Window
+
+    with startup_profile.span("exp_win"):
+        exp_win = Window(**config.EXP_WINDOW, monitor=config.EXP_MONITOR)
     exp_win.mouseVisible = False
+    if launch_time is not None:
+        # time.perf_counter() when the program started
+        exp_win.callOnFlip(_log_time_to_first_frame, launch_time)
 
     if show_ctl_win:
-        ctl_win = visual.Window(**config.CTL_WINDOW)
+        with startup_profile.span("ctl_win"):
+            ctl_win = Window(**config.CTL_WINDOW)
         ctl_win.name = "Stimuli"
     else:
         ctl_win = None
@@ -179,6 +203,8 @@ def main_loop(
     eyetracker_client = None
     gaze_drawer = None
     if enable_eyetracker:
+        from . import eyetracking
+
         print("creating et client")
         eyetracker_client = eyetracking.EyeTrackerClient(
             output_path=log_path,
@@ -187,6 +213,7 @@ def main_loop(
             debug=False,
             use_targets = calibration_targets,
             validate_calib = validate_eyetrack,
+            listener_process = et_listener_process,
         )
         print("starting et client")
         eyetracker_client.start()
@@ -218,6 +245,8 @@ We are coming to get you out of the scanner shortly."""
         )
 
         if not skip_soundcheck:
+            from ..tasks import video
+
             setup_video_path = utils.get_subject_soundcheck_video(subject)
             all_tasks = itertools.chain([
                 task_base.Pause(
@@ -247,7 +276,9 @@ Thanks for your participation!"""
         print("_" * 50)
 
     try:
-        for task in all_tasks:
+        all_tasks = iter(all_tasks)
+        task = next(all_tasks, None)
+        while task is not None:
 
             # clear events buffer in case the user pressed a lot of buttoons
             event.clearEvents()
@@ -257,14 +288,15 @@ Thanks for your participation!"""
                 use_eyetracking = True
 
             # setup task files (eg. video)
-            task.setup(
-                exp_win,
-                log_path,
-                log_name_prefix,
-                use_fmri=use_fmri,
-                use_meg=use_meg,
-                use_eeg=use_eeg,
-            )
+            with startup_profile.span(f"setup {task.name}"):
+                task.setup(
+                    exp_win,
+                    log_path,
+                    log_name_prefix,
+                    use_fmri=use_fmri,
+                    use_meg=use_meg,
+                    use_eeg=use_eeg,
+                )
             print("READY")
 
             while True:
@@ -299,6 +331,13 @@ Thanks for your participation!"""
                     # send stop trigger/marker to MEG + Biopac (or anything else on parallel port)
                     break
 
+            # the next task is only known now, session generators can depend on
+            # the completion of this task: prepare it while this one is unloaded
+            next_task = None
+            if shortcut_evt != "q":
+                next_task = next(all_tasks, None)
+                if next_task is not None:
+                    next_task.prepare_async()
 
             if record_movie:
                 out_fname = os.path.join(
@@ -317,10 +356,13 @@ Thanks for your participation!"""
                 # there is anyway the duration of the instruction before listening to TTL
                 for i in range(DELAY_BETWEEN_TASK * config.FRAME_RATE):
                     exp_win.flip(clearBuffer=i<2)
+            task = next_task
 
         exp_win.saveFrameIntervals("exp_win_frame_intervals.txt")
         if ctl_win:
             ctl_win.saveFrameIntervals("ctl_win_frame_intervals.txt")
+        if headless:
+            exp_win.report()
 
     except (KeyboardInterrupt, SystemExit) as ki:
         print(traceback.format_exc())
@@ -337,3 +379,9 @@ Thanks for your participation!"""
     finally:
         if enable_eyetracker:
             eyetracker_client.join(TIMEOUT)
+        # output pending trigger pulses and reset the ports
+        meg.close()
+        eeg.close()
+        fmri.close()
+        # wait for all events to be written to disk
+        event_writer.close()
@@ -0,0 +1,93 @@
+# movie stimuli opened a few trials ahead and closed once played, instead of all at setup
+
+from concurrent.futures import ThreadPoolExecutor
+
+from psychopy import visual, logging
+
+# clips opened after the current one
+CLIPS_AHEAD = 2
+READ_CHUNK = 1024 ** 2
+
+
+def _warm_file(path):
+    # read the file once so that opening its decoder does not wait for the disk
+    with open(path, "rb") as f:
+        while f.read(READ_CHUNK):
+            pass
+
+
+class ClipPool(object):
+    """Sliding window of open MovieStim over the clips of a design.
+
+    Only the current clip and the `ahead` next ones have an open decoder, so
+    memory and file handles do not grow with the length of the run. Files of
+    the following clips are read on a worker thread, open_ahead() creates the
+    stimuli on the main thread (they own GL textures) and is meant to be
+    called while a static screen (eg. fixation) is shown; decoders of played
+    clips are closed on the worker thread.
+    """
+
+    def __init__(self, win, paths, ahead=CLIPS_AHEAD, on_open=None, **movie_kwargs):
+        self.win = win
+        self.paths = list(paths)
+        self.ahead = ahead
+        self._on_open = on_open
+        self._movie_kwargs = movie_kwargs
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clip_pool")
+        self._clips = {}  # clip index -> MovieStim
+        self._warmed = set()
+        # closed stimuli are only released by the main thread, once their decoder is closed
+        self._closing = []
+        self.n_misses = 0
+
+    def _open(self, idx):
+        clip = visual.MovieStim(self.win, self.paths[idx], **self._movie_kwargs)
+        if self._on_open is not None:
+            self._on_open(clip)
+        self._clips[idx] = clip
+        return clip
+
+    def _warm(self, idx):
+        if idx < len(self.paths) and idx not in self._warmed:
+            self._warmed.add(idx)
+            self._executor.submit(_warm_file, self.paths[idx])
+
+    def open_ahead(self, idx):
+        """Open clips idx to idx+ahead, start reading the files of the next ones."""
+        last = min(idx + self.ahead, len(self.paths) - 1)
+        for next_idx in range(idx, last + 1):
+            if next_idx not in self._clips:
+                self._open(next_idx)
+        for next_idx in range(last + 1, last + 1 + self.ahead):
+            self._warm(next_idx)
+        self._release_closed()
+
+    def get(self, idx):
+        clip = self._clips.get(idx)
+        if clip is None:
+            self.n_misses += 1
+            logging.warning(f"clip_pool: {self.paths[idx]} was not opened ahead")
+            clip = self._open(idx)
+        return clip
+
+    def close(self, idx):
+        clip = self._clips.pop(idx, None)
+        if clip is not None:
+            self._closing.append((clip, self._executor.submit(clip._player.unload)))
+
+    def _release_closed(self):
+        self._closing = [(clip, future) for clip, future in self._closing if not future.done()]
+
+    def __len__(self):
+        return len(self._clips)
+
+    def reset(self):
+        """Close all clips, eg. when restarting a task."""
+        for idx in list(self._clips):
+            self.close(idx)
+        self._warmed.clear()
+
+    def clear(self):
+        self.reset()
+        self._executor.shutdown(wait=True)
+        self._closing.clear()
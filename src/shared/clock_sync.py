@@ -0,0 +1,84 @@
+# map timestamps of a remote clock (eg. LSL) to the psychopy monotonic clock
+
+import threading
+import collections
+import numpy as np
+from psychopy import core, logging
+
+# one paired reading every SYNC_INTERVAL seconds, the fit uses the last SYNC_WINDOW pairs
+SYNC_INTERVAL = 0.1
+SYNC_WINDOW = 600
+# readings per pair, the one with the shortest local bracket is kept
+SYNC_READS = 3
+
+
+class ClockSync(threading.Thread):
+    """Estimate offset and drift of a clock relative to psychopy core.getTime.
+
+    The remote clock is read between two reads of the local clock, pairs are
+    regressed over a sliding window, so to_local does not read any clock:
+    receiving threads can convert each sample timestamp at no cost.
+    """
+
+    def __init__(self, remote_clock, interval=SYNC_INTERVAL, window=SYNC_WINDOW, name="clock_sync"):
+        super().__init__(name=name, daemon=True)
+        self._remote_clock = remote_clock
+        self._interval = interval
+        self._pairs = collections.deque(maxlen=window)
+        self._stop_event = threading.Event()
+        # (remote reference, local at reference, slope), swapped atomically
+        self._fit = None
+        self.residual = np.nan
+        self.add_pair()
+
+    def _read_pair(self):
+        best = None
+        for _ in range(SYNC_READS):
+            t0 = core.getTime()
+            remote = self._remote_clock()
+            t1 = core.getTime()
+            if best is None or t1 - t0 < best[2]:
+                best = (remote, (t0 + t1) / 2, t1 - t0)
+        return best[:2]
+
+    def add_pair(self):
+        self._pairs.append(self._read_pair())
+        pairs = np.asarray(self._pairs)
+        remote_ref, local_ref = pairs[-1]
+        if len(pairs) < 2:
+            self._fit = (remote_ref, local_ref, 1.)
+            return
+        # centered on the last pair to keep precision with large clock values
+        x = pairs[:, 0] - remote_ref
+        y = pairs[:, 1] - local_ref
+        slope, intercept = np.polyfit(x, y, 1)
+        self.residual = np.sqrt(np.mean((y - (slope * x + intercept)) ** 2))
+        self._fit = (remote_ref, local_ref + intercept, slope)
+
+    def run(self):
+        while not self._stop_event.wait(self._interval):
+            self.add_pair()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        logging.exp(
+            f"clock_sync: offset {self.offset:.6f}s, drift {self.drift * 1e6:.2f}ppm, "
+            f"residual {self.residual * 1e6:.1f}us over {len(self._pairs)} pairs"
+        )
+
+    def to_local(self, remote_timestamp):
+        """Convert a timestamp of the remote clock to core.getTime() time."""
+        remote_ref, local_ref, slope = self._fit
+        return local_ref + slope * (remote_timestamp - remote_ref)
+
+    @property
+    def offset(self):
+        # local - remote, at the last pair
+        remote_ref, local_ref, _ = self._fit
+        return local_ref - remote_ref
+
+    @property
+    def drift(self):
+        return self._fit[2] - 1.
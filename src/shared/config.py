@@ -45,6 +45,9 @@ CTL_WINDOW = dict(
 
 FRAME_RATE = 120
 
+# seconds from launch to first frame, checked with `python -m src.shared.startup_profile`
+STARTUP_BUDGET = 15
+
 # task parameters
 INSTRUCTION_DURATION = 3
 
@@ -55,3 +58,7 @@ PARALLEL_PORT_ADDRESS = "/dev/parport1"
 
 # serial port for eeg setup
 SERIAL_PORT_ADDRESS = "/dev/ttyACM0"
+
+# if set, meg/eeg triggers are written with their time to files in this directory
+# instead of the ports, to test without the hardware
+TRIGGER_LOOPBACK_DIR = None
@@ -0,0 +1,122 @@
+# waiting for deadlines of task clocks: sleep most of the wait, spin only the last part
+
+import time
+
+import numpy as np
+from psychopy import logging
+
+# spin before a deadline, calibrated from how late sleeps wake up
+SPIN_MARGIN = .002
+MIN_SPIN_MARGIN = .0002
+# weight of each sleep in the running estimate of the wake up delay
+CALIBRATION_WEIGHT = .02
+# the margin covers the mean wake up delay plus this many standard deviations
+CALIBRATION_STDS = 4
+# window events are pumped at most this often while spinning
+SPIN_POLL_INTERVAL = .001
+# edges of the overshoot histogram, in seconds
+OVERSHOOT_BINS = np.array(
+    [0, 10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 2e-3, 5e-3, 10e-3, np.inf]
+)
+
+_waiter = None
+
+
+class DeadlineWaiter(object):
+    """Hybrid sleep/spin waits with a self-calibrating spin margin.
+
+    time.sleep is used until spin_margin before the deadline (it is an
+    absolute clock_nanosleep on Linux since python 3.11), then the thread
+    spins to the deadline. The wake up delay of each sleep updates the
+    margin, so that the spin stays as short as the system allows. The
+    overshoot of every wait, from its deadline to its return, is counted in
+    a histogram.
+    """
+
+    def __init__(self, spin_margin=SPIN_MARGIN):
+        self.spin_margin = spin_margin
+        self._delay_mean = spin_margin / 2
+        self._delay_var = (spin_margin / 2 / CALIBRATION_STDS) ** 2
+        self.reset()
+
+    def reset(self):
+        self.overshoots = np.zeros(len(OVERSHOOT_BINS) - 1, dtype=int)
+        self.n_waits = self.n_late = 0
+        self.max_overshoot = 0.
+        self.sleep_time = self.spin_time = 0.
+
+    def _sleep(self, duration):
+        t_start = time.perf_counter()
+        time.sleep(duration)
+        t_end = time.perf_counter()
+        self.sleep_time += t_end - t_start
+        # calibrate the spin margin with the wake up delay
+        delta = t_end - t_start - duration - self._delay_mean
+        self._delay_mean += CALIBRATION_WEIGHT * delta
+        self._delay_var = (1 - CALIBRATION_WEIGHT) * (
+            self._delay_var + CALIBRATION_WEIGHT * delta * delta
+        )
+        self.spin_margin = max(
+            MIN_SPIN_MARGIN, self._delay_mean + CALIBRATION_STDS * np.sqrt(self._delay_var)
+        )
+        return t_end
+
+    def wait(self, clock, deadline, max_spin=np.inf, poll_interval=.0005, poll=None):
+        """Wait until clock reaches deadline, yielding after each sleep.
+
+        poll (eg. pumping window events) is called after each sleep, and at
+        most every SPIN_POLL_INTERVAL while spinning.
+        """
+        # the clock is read once, the wait runs on perf_counter
+        now = time.perf_counter()
+        remaining = deadline - clock.getTime()
+        end = now + remaining
+        if remaining < 0:
+            self.n_late += 1
+        spin_start = end - min(self.spin_margin, max_spin)
+
+        if poll:
+            poll()
+        now = time.perf_counter()
+        while now < spin_start:
+            now = self._sleep(min(poll_interval, spin_start - now))
+            if poll:
+                poll()
+                now = time.perf_counter()
+            yield
+
+        t_spin = now
+        next_poll = now + SPIN_POLL_INTERVAL
+        while now < end:
+            if poll and now >= next_poll:
+                poll()
+                next_poll = time.perf_counter() + SPIN_POLL_INTERVAL
+            now = time.perf_counter()
+        self.spin_time += max(0., now - t_spin)
+
+        overshoot = max(0., now - end)
+        self.n_waits += 1
+        self.max_overshoot = max(self.max_overshoot, overshoot)
+        self.overshoots[np.searchsorted(OVERSHOOT_BINS, overshoot, side="right") - 1] += 1
+
+    def report(self, name=""):
+        bins = ", ".join(
+            f"<{edge * 1e6:.0f}us: {count}"
+            for edge, count in zip(OVERSHOOT_BINS[1:-1], self.overshoots[:-1])
+            if count
+        )
+        if self.overshoots[-1]:
+            bins += f", >{OVERSHOOT_BINS[-2] * 1e6:.0f}us: {self.overshoots[-1]}"
+        logging.exp(
+            f"deadline {name}: {self.n_waits} waits ({self.n_late} late calls), "
+            f"max overshoot {self.max_overshoot * 1e6:.0f}us, "
+            f"slept {self.sleep_time:.2f}s, spun {self.spin_time:.2f}s, "
+            f"spin margin {self.spin_margin * 1e6:.0f}us; overshoots {bins}"
+        )
+
+
+def get_waiter():
+    global _waiter
+    if _waiter is None:
+        _waiter = DeadlineWaiter()
+    return _waiter
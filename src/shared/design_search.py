@@ -0,0 +1,76 @@
+# reproducible search of a random design satisfying constraints, over seeds in parallel
+
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# seeds evaluated in one call, candidates of a batch are generated and checked together
+BATCH_SIZE = 256
+
+# set in each worker process by the pool initializer
+_evaluate = None
+_evaluate_args = ()
+
+
+def _init_worker(evaluate, args):
+    global _evaluate, _evaluate_args
+    _evaluate = evaluate
+    _evaluate_args = args
+
+
+def _evaluate_batch(first_seed, last_seed):
+    return _evaluate(range(first_seed, last_seed), *_evaluate_args)
+
+
+def search(evaluate, first_seed, last_seed, args=(), batch_size=BATCH_SIZE, n_workers=None):
+    """Lowest seed in [first_seed, last_seed[ generating a valid design, None if none.
+
+    evaluate(seeds, *args) must be a module-level function (it is sent to the
+    worker processes with args once, at pool startup) returning the lowest seed
+    of the `seeds` range giving a valid design, or None.
+    Batches of consecutive seeds are fanned out over n_workers processes, once a
+    valid seed is found no more batches are submitted, pending batches of higher
+    seeds are cancelled and only lower batches are waited for: the result is the
+    same as evaluating all seeds in order.
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+
+    if n_workers == 1:
+        for start in range(first_seed, last_seed, batch_size):
+            seed = evaluate(range(start, min(start + batch_size, last_seed)), *args)
+            if seed is not None:
+                return seed
+        return None
+
+    executor = ProcessPoolExecutor(
+        max_workers=n_workers, initializer=_init_worker, initargs=(evaluate, args)
+    )
+    pending = {}  # future -> first seed of the batch
+    next_seed = first_seed
+    found = None
+    try:
+        while True:
+            while found is None and next_seed < last_seed and len(pending) < 2 * n_workers:
+                stop = min(next_seed + batch_size, last_seed)
+                pending[executor.submit(_evaluate_batch, next_seed, stop)] = next_seed
+                next_seed = stop
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                seed = future.result()
+                if seed is not None and (found is None or seed < found):
+                    found = seed
+
+            if found is not None:
+                # batches of higher seeds cannot change the result
+                for future, start in list(pending.items()):
+                    if start > found:
+                        future.cancel()
+                        del pending[future]
+    finally:
+        # do not wait for the cancelled batches that were already running
+        executor.shutdown(wait=False, cancel_futures=True)
+    return found
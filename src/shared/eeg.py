@@ -1,6 +1,4 @@
-import serial
-from . import config
-import time
+from . import config, triggers
 
 EEG_MARKERS_ON_FLIP = True
 
@@ -12,28 +10,36 @@ EEG_settings = {
     "TASK_FLIP": 1,
 }
 
-port = None
+trigger_output = None
 current_signal = 0
 reset = False
 reset_value = 0
 
+def get_trigger_output():
+    global trigger_output
+    if not trigger_output:
+        trigger_output = triggers.TriggerScheduler(
+            triggers.open_backend("serial", config.SERIAL_PORT_ADDRESS, "eeg_triggers"),
+            name="eeg_triggers",
+        )
+        trigger_output.start()
+    return trigger_output
+
 def send_signal(data, reset=False):
-    global port, reset_value
-    if not port:
-        port = serial.Serial(config.SERIAL_PORT_ADDRESS)
-    if reset:
-        start=time.monotonic()
-    port.write(data.to_bytes(1, byteorder='big'))
-    # hog cpu for accurate timing
+    # the pulse and its reset are timed by the output thread
     if reset:
-        while time.monotonic() < start + EEG_MARKER_DURATION:
-            continue
-        port.write(reset_value.to_bytes(1, byteorder='big'))  # reset
+        get_trigger_output().pulse(data, EEG_MARKER_DURATION, reset_value)
+    else:
+        get_trigger_output().level(data)
 
 def set_trigger_signal():
-    global port, current_signal
-    if not port:
-        port = serial.Serial(config.SERIAL_PORT_ADDRESS)
+    global current_signal
     new_signal = 0 if current_signal else EEG_settings["TASK_FLIP"]
-    port.write(new_signal.to_bytes(1, byteorder='big'))
+    get_trigger_output().level(new_signal)
     current_signal = new_signal
+
+def close():
+    global trigger_output
+    if trigger_output:
+        trigger_output.stop()
+        trigger_output = None
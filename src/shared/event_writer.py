@@ -0,0 +1,136 @@
+# asynchronous persistence of task events
+
+import os, json, threading, queue, atexit, traceback
+from psychopy import logging
+
+# max number of pending write jobs, logging blocks (rather than drop events) when full
+QUEUE_SIZE = 10000
+
+JOURNAL_EXT = "jsonl"
+
+
+class EventWriter(threading.Thread):
+    def __init__(self, maxsize=QUEUE_SIZE):
+        super().__init__(name="event_writer", daemon=True)
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._journals = {}
+
+    def run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            func, args = job
+            try:
+                func(*args)
+            except Exception:
+                logging.error("event_writer: %s" % traceback.format_exc())
+        for fd in self._journals.values():
+            fd.close()
+        self._journals.clear()
+
+    def submit(self, func, *args):
+        # run func(*args) on the writer thread, jobs are run in submission order
+        self._queue.put((func, args))
+
+    def append(self, fname, event):
+        self._queue.put((self._append, (fname, event)))
+
+    def _append(self, fname, event):
+        fd = self._journals.get(fname)
+        if fd is None:
+            fd = self._journals[fname] = open(fname, "a")
+        fd.write(json.dumps(event, default=str) + "\n")
+        # push to the OS so that a crash of the stimuli keeps what was logged
+        fd.flush()
+
+    def write_tsv(self, fname, events, journal_fname=None):
+        self._queue.put((self._write_tsv, (fname, events, journal_fname)))
+
+    def _write_tsv(self, fname, events, journal_fname):
+        # pandas is only needed (and imported) on the writer thread
+        import pandas
+
+        df = pandas.DataFrame(events)
+        df.to_csv(fname, sep="\t", index=False)
+        if journal_fname is not None:
+            self._discard_journal(journal_fname)
+
+    def discard_journal(self, fname):
+        self._queue.put((self._discard_journal, (fname,)))
+
+    def _discard_journal(self, fname):
+        fd = self._journals.pop(fname, None)
+        if fd is not None:
+            fd.close()
+        if os.path.exists(fname):
+            os.remove(fname)
+
+    def close(self, timeout=None):
+        self._queue.put(None)
+        self.join(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = EventWriter()
+            _writer.start()
+        return _writer
+
+
+def close(timeout=None):
+    # drain all pending writes, called at the end of the session
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None and writer.is_alive():
+        writer.close(timeout)
+
+
+atexit.register(close)
+
+
+class StreamedEvents(list):
+    """List of events that journals each appended event to disk in the background.
+
+    The journal file name is only reserved at the first event, so tasks that
+    never log events do not leave empty files behind. Each journal line has
+    the index of its event in "_row": events changed after being logged are
+    journaled again with update_event, the last line of a row is its latest
+    version.
+    """
+
+    def __init__(self, journal_fname_factory):
+        super().__init__()
+        self._journal_fname_factory = journal_fname_factory
+        self.journal_fname = None
+
+    def _journal(self, row):
+        if self.journal_fname is None:
+            self.journal_fname = self._journal_fname_factory()
+            # reserve the name now, the writer thread might not have created it yet
+            open(self.journal_fname, "a").close()
+        # copy as tasks might update the event after logging it
+        get_writer().append(self.journal_fname, dict(self[row], _row=row))
+
+    def append(self, event):
+        super().append(event)
+        self._journal(len(self) - 1)
+
+    def update_event(self, row, values):
+        """Update a logged event in place, and journal its new version."""
+        row = range(len(self))[row]
+        self[row].update(values)
+        self._journal(row)
+
+    def discard_journal(self):
+        """Close and remove the journal, once the events are saved or not needed."""
+        if self.journal_fname is not None:
+            get_writer().discard_journal(self.journal_fname)
+            self.journal_fname = None
@@ -5,9 +5,11 @@ from .zmq_tools import *
 import msgpack
 
 import numpy as np
-from scipy.spatial.distance import pdist
 from psychopy import visual, core, data, logging, event
 from .ellipse import Ellipse
+from .fixation import fixation_dot
+from . import gaze_qc
+from .sample_buffer import SampleBuffer, PUPIL_DTYPE, GAZE_SAMPLE_DTYPE, pupil_row, gaze_row
 
 from ..tasks.task_base import Task
 from . import config
@@ -126,14 +128,19 @@ class EyetrackerCalibration_targets(Task):
             self.eyetracker.unset_pupil_cb()
             return
         if pupil["timestamp"] > self.task_start:
-            self._pupils_list.append(pupil)
+            self._pupils.append(pupil_row(pupil))
+            # full pupil data is only required to be sent for calibration
+            if not self.validation:
+                self._pupils_list.append(pupil)
 
     def _gaze_cb(self, gaze):
         if gaze["timestamp"] > self.task_stop:
             self.eyetracker.unset_gaze_cb()
             return
         if gaze["timestamp"] > self.task_start:
-            self._gaze_list.append(gaze)
+            self._gaze.append(gaze_row(gaze))
+            if self.validation:
+                self._gaze_qc.add_gaze(gaze)
 
     def _run(self, exp_win, ctl_win):
 
@@ -173,14 +180,17 @@ class EyetrackerCalibration_targets(Task):
 
             self.all_refs_per_flip = []
             self._pupils_list = []
-            self._gaze_list = []
+            self._pupils = SampleBuffer(PUPIL_DTYPE)
+            self._gaze = SampleBuffer(GAZE_SAMPLE_DTYPE)
+            # validation metrics are updated as gaze is received
+            self._gaze_qc = gaze_qc.StreamingGazeQC(conf_thresh=0.80)
 
             self.task_start = time.monotonic()
             self.task_stop = np.inf
             self.eyetracker.set_pupil_cb(self._pupil_cb)
             self.eyetracker.set_gaze_cb(self._gaze_cb)
 
-            while not len(self._pupils_list):  # wait until we get at least a pupil
+            while not len(self._pupils):  # wait until we get at least a pupil
                 yield False
 
             if self.validation:
@@ -198,7 +208,7 @@ class EyetrackerCalibration_targets(Task):
                 self.startcue.draw(exp_win)
                 yield True
 
-            for site_id in markers_order:
+            for marker_n, site_id in enumerate(markers_order):
                 marker_pos = self.markers[site_id]
                 pos = (marker_pos - 0.5) * window_size_frame # remove 0.5 since 0, 0 is the middle in psychopy
                 for stim in self.fixation_dot:
@@ -235,6 +245,8 @@ class EyetrackerCalibration_targets(Task):
                             "timestamp": time.monotonic(),  # =pupil frame timestamp on same computer
                         }
                         self.all_refs_per_flip.append(ref)  # accumulate all refs
+                        if self.validation:
+                            self._gaze_qc.add_ref(marker_n, ref["norm_pos"], ref["timestamp"])
                     yield True
             yield True
             print("completed markers")
@@ -244,14 +256,15 @@ class EyetrackerCalibration_targets(Task):
 
             if self.validation:
                 logging.info(
-                    f"validating on {len(self._pupils_list)} pupils and {len(self.all_refs_per_flip)} markers"
+                    f"validating on {len(self._pupils)} pupils and {len(self.all_refs_per_flip)} markers"
                 )
 
-                print('Ǹumber of received gaze: ', str(len(self._gaze_list)))
-                val_qc = self.eyetracker.validate(self._gaze_list,
-                                                  self.all_refs_per_flip,
-                                                  self.marker_duration_frames - (self.calibration_lead_in + self.calibration_lead_out),
-                                                  )
+                print('Ǹumber of received gaze: ', str(len(self._gaze)))
+                self._gaze_qc.finish()
+                val_qc = self._gaze_qc.summary(
+                    self.marker_duration_frames - (self.calibration_lead_in + self.calibration_lead_out),
+                )
+                print_val_qc(val_qc)
 
                 # If self.feedback = True, display calib results on screen
                 if self.feedback:
@@ -259,7 +272,7 @@ class EyetrackerCalibration_targets(Task):
                     qc_dots = []
 
                 for vqc in val_qc:
-                    self._events[vqc['marker']].update(vqc)
+                    self._events.update_event(vqc['marker'], vqc)
                     if self.feedback:
                         pos = (np.array(vqc['norm_pos']) - 0.5) * window_size_frame
                         if 'good' in vqc:
@@ -288,7 +301,7 @@ class EyetrackerCalibration_targets(Task):
 
             else:
                 logging.info(
-                    f"calibrating on {len(self._pupils_list)} pupils and {len(self.all_refs_per_flip)} markers"
+                    f"calibrating on {len(self._pupils)} pupils and {len(self.all_refs_per_flip)} markers"
                 )
                 logging.flush()
 
@@ -321,14 +334,14 @@ class EyetrackerCalibration_targets(Task):
         yield
 
     def _save(self):
-        if hasattr(self, "_pupils_list"):
+        if hasattr(self, "_pupils"):
             if self.validation:
                 fname = self._generate_unique_filename("valid-data", "npz")
             else:
                 fname = self._generate_unique_filename("calib-data", "npz")
-            np.savez(fname, pupils=self._pupils_list,
-                            gaze=self._gaze_list,
-                            markers=self.all_refs_per_flip)
+            np.savez(fname, pupils=self._pupils.data,
+                            gaze=self._gaze.data,
+                            markers=_refs_to_array(self.all_refs_per_flip))
 
 
 class EyetrackerCalibration(Task):
@@ -381,6 +394,7 @@ While awaiting for the calibration to start you will be asked to roll your eyes.
             self.eyetracker.unset_pupil_cb()
             return
         if pupil["timestamp"] > self.task_start:
+            self._pupils.append(pupil_row(pupil))
             self._pupils_list.append(pupil)
 
     def _run(self, exp_win, ctl_win):
@@ -428,6 +442,7 @@ While awaiting for the calibration to start you will be asked to roll your eyes.
 
             self.all_refs_per_flip = []
             self._pupils_list = []
+            self._pupils = SampleBuffer(PUPIL_DTYPE)
 
             radius_anim = np.hstack(
                 [
@@ -444,7 +459,7 @@ While awaiting for the calibration to start you will be asked to roll your eyes.
             for _ in range(2):
                 instructions.draw(exp_win)
                 yield True
-            while not len(self._pupils_list):  # wait until we get at least a pupil
+            while not len(self._pupils):  # wait until we get at least a pupil
                 yield False
 
             exp_win.logOnFlip(
@@ -483,7 +498,7 @@ While awaiting for the calibration to start you will be asked to roll your eyes.
             yield True
             self.task_stop = time.monotonic()
             logging.info(
-                f"calibrating on {len(self._pupils_list)} pupils and {len(self.all_refs_per_flip)} markers"
+                f"calibrating on {len(self._pupils)} pupils and {len(self.all_refs_per_flip)} markers"
             )
             self.eyetracker.calibrate(self._pupils_list, self.all_refs_per_flip)
             while True:
@@ -502,9 +517,13 @@ While awaiting for the calibration to start you will be asked to roll your eyes.
         yield
 
     def _save(self):
-        if hasattr(self, "_pupils_list"):
+        if hasattr(self, "_pupils"):
             fname = self._generate_unique_filename("calib-data", "npz")
-            np.savez(fname, pupils=self._pupils_list, markers=self.all_refs_per_flip)
+            np.savez(
+                fname,
+                pupils=self._pupils.data,
+                markers=_refs_to_array(self.all_refs_per_flip),
+            )
 
 
 class EyetrackerSetup(Task):
@@ -552,17 +571,19 @@ class EyetrackerSetup(Task):
 
 from subprocess import Popen
 
-from contextlib import contextmanager
-
-
-@contextmanager
-def nonblocking(lock):
-    locked = lock.acquire(False)
-    try:
-        yield locked
-    finally:
-        if locked:
-            lock.release()
+# listener: max wait for new messages, bounds the latency of pause/stop requests
+LISTENER_POLL_TIMEOUT_MS = 10
+# listener: max number of messages received per wakeup before dispatching them
+LISTENER_MAX_BATCH = 256
+# pause: max wait for the listener to release the socket, in seconds
+LISTENER_PAUSE_TIMEOUT = 2
+
+LISTENER_TOPICS = (
+    "gaze", "pupil", "fixations",
+    "notify.calibration.successful",
+    "notify.calibration.failed",
+    "notify.aravis",
+)
 
 
 class EyeTrackerClient(threading.Thread):
@@ -570,24 +591,31 @@ class EyeTrackerClient(threading.Thread):
     EYE = "eye0"
 
     def __init__(self, output_path, output_fname_base, profile=False,
-                 debug=False, use_targets=False, validate_calib=False):
+                 debug=False, use_targets=False, validate_calib=False,
+                 listener_process=False):
         super(EyeTrackerClient, self).__init__()
         self.stoprequest = threading.Event()
+        # set while the listener should receive, cleared to pause it
+        self._active = threading.Event()
+        # set by the listener once it has closed its socket
+        self._idle = threading.Event()
+        self._idle.set()
         self.paused = True
-        self.pause_cond = threading.Condition(threading.Lock())
-        self.pause_cond.acquire()
-        self.lock = threading.Lock()
         self._pupil_cb = self._gaze_cb = self._fix_cb = None
 
         self.pupil_monitor = None
 
+        # latest samples are published by swapping a reference: readers never lock
         self.pupil = None
         self.gaze = None
+        self._aravis_notification = None
+        self._reset_metrics()
         self.unset_pupil_cb()
         self.unset_gaze_cb()
 
         self.use_targets = use_targets
         self.validate_calib = validate_calib
+        self._listener_process = None
 
         CAPTURE_SETTINGS["exposure_time"] = 4000
 
@@ -688,6 +716,15 @@ class EyeTrackerClient(threading.Thread):
         self._req_socket.send_string("SUB_PORT")
         self._ipc_sub_port = int(self._req_socket.recv())
         logging.info(f"ipc_sub_port: {self._ipc_sub_port}")
+
+        if listener_process:
+            # latest gaze/pupil decoded out of the stimuli process, callbacks
+            # (calibration) are still served by this thread
+            from .eyetracking_process import EyeTrackerListenerProcess
+            self._listener_process = EyeTrackerListenerProcess(
+                f"tcp://localhost:{self._ipc_sub_port}", self.record_dir
+            )
+            self._listener_process.start()
         self.resume()
 
     def start_source(self):
@@ -752,66 +789,126 @@ class EyeTrackerClient(threading.Thread):
         self.send_recv_notification({"subject": "launcher_process.should_stop"})
         self._pupil_process.wait(timeout)
         self._pupil_process.terminate()
+        if self._listener_process:
+            self._listener_process.stop(timeout)
         time.sleep(1 / 60.0)
         super(EyeTrackerClient, self).join(timeout)
 
     def pause(self):
+        if self.paused:
+            return
         self.paused = True
         print('pause eyetracking coms')
-        self.pause_cond.acquire()
-        del self.pupil_monitor
+        self._idle.clear()
+        self._active.clear()
+        # wait for the listener to be done with the socket and callbacks
+        if self.is_alive() and not self._idle.wait(LISTENER_PAUSE_TIMEOUT):
+            logging.error(
+                "eyetracker listener: not idle %.1fs after pause, continuing" % LISTENER_PAUSE_TIMEOUT
+            )
+        logging.info("eyetracker listener: %s" % self.get_metrics())
 
     def resume(self):
         if self.paused:
             print('resume eyetracking coms')
-            self.pupil_monitor = Msg_Receiver(
-
-                self._ctx, f"tcp://localhost:{self._ipc_sub_port}",
-                topics=(
-                    "gaze", "pupil", "fixations",
-                    "notify.calibration.successful",
-                    "notify.calibration.failed",
-                    "notify.aravis")
-
-            )
             self.paused = False
-            self.pause_cond.notify()
-            self.pause_cond.release()
+            self._active.set()
+
+    def _reset_metrics(self):
+        self._n_msgs = 0
+        self._n_wakeups = 0
+        self._last_batch_size = 0
+        self._max_batch_size = 0
+        self._rate_start_time = time.monotonic()
+        self._rate_n_msgs = 0
+        self.msg_rate = 0.
+
+    def get_metrics(self):
+        return {
+            "messages": self._n_msgs,
+            "wakeups": self._n_wakeups,
+            "msg_rate": self.msg_rate,
+            "last_batch": self._last_batch_size,
+            "max_batch": self._max_batch_size,
+        }
+
+    def _drain(self, socket):
+        # receive all pending messages without decoding them
+        batch = []
+        while len(batch) < LISTENER_MAX_BATCH:
+            try:
+                batch.append(socket.recv_multipart(zmq.NOBLOCK))
+            except zmq.Again:
+                break
+        return batch
+
+    def _dispatch(self, batch):
+        pupil = gaze = None
+        for frames in batch:
+            topic = frames[0].decode("utf-8")
+            tmp = self.pupil_monitor.deserialize_payload(*frames[1:])
+            if topic.startswith("pupil"):
+                pupil = tmp
+                if self._pupil_cb:
+                    self._pupil_cb(tmp)
+            elif topic.startswith("gaze"):
+                gaze = tmp
+                if self._gaze_cb:
+                    self._gaze_cb(tmp)
+            elif topic.startswith("fixations"):
+                self.fixation = tmp
+                if self._fix_cb:
+                    self._fix_cb(tmp)
+            elif topic.startswith("notify.calibration"):
+                self._last_calibration_notification = tmp
+            elif topic.startswith("notify.aravis.start_capture"):
+                self._aravis_notification = tmp
+        # publish only the latest samples of the batch
+        if pupil is not None:
+            self.pupil = pupil
+        if gaze is not None:
+            self.gaze = gaze
+
+    def _update_metrics(self, batch_size):
+        self._n_wakeups += 1
+        self._n_msgs += batch_size
+        self._last_batch_size = batch_size
+        self._max_batch_size = max(self._max_batch_size, batch_size)
+        self._rate_n_msgs += batch_size
+        now = time.monotonic()
+        if now - self._rate_start_time >= 1.:
+            self.msg_rate = self._rate_n_msgs / (now - self._rate_start_time)
+            self._rate_start_time = now
+            self._rate_n_msgs = 0
 
     def run(self):
 
-        self._aravis_notification = None
-
-        while not self.stoprequest.isSet():
-            if self.paused:
-                time.sleep(1e-3)
+        while not self.stoprequest.is_set():
+            if not self._active.wait(timeout=LISTENER_POLL_TIMEOUT_MS / 1000.):
                 continue
-            with self.pause_cond:
-                msg = self.pupil_monitor.recv()
-                if not msg is None:
-                    topic, tmp = msg
-                    with self.lock:
-                        if topic.startswith("pupil"):
-                            self.pupil = tmp
-                            if self._pupil_cb:
-                                self._pupil_cb(tmp)
-                        elif topic.startswith("gaze"):
-                            self.gaze = tmp
-                            if self._gaze_cb:
-                                self._gaze_cb(tmp)
-                        elif topic.startswith("fixations"):
-                            self.fixation = tmp
-                            if self._fix_cb:
-                                self._fix_cb(tmp)
-                        elif topic.startswith("notify.calibration"):
-                            self._last_calibration_notification = tmp
-                        elif topic.startswith("notify.aravis.start_capture"):
-                            self._aravis_notification = tmp
+            # the socket is owned by this thread for the whole active period
+            self.pupil_monitor = Msg_Receiver(
+                self._ctx, f"tcp://localhost:{self._ipc_sub_port}",
+                topics=LISTENER_TOPICS,
+            )
+            poller = zmq.Poller()
+            poller.register(self.pupil_monitor.socket, zmq.POLLIN)
+            self._reset_metrics()
+
+            while self._active.is_set() and not self.stoprequest.is_set():
+                if not poller.poll(LISTENER_POLL_TIMEOUT_MS):
+                    continue
+                batch = self._drain(self.pupil_monitor.socket)
+                self._dispatch(batch)
+                self._update_metrics(len(batch))
+
+            poller.unregister(self.pupil_monitor.socket)
+            self.pupil_monitor.socket.close()
+            self.pupil_monitor = None
+            self._idle.set()
+        self._idle.set()
         logging.info("eyetracker listener: stopping")
 
-
-
-
     def set_pupil_cb(self, pupil_cb):
         self._pupil_cb = pupil_cb
 
@@ -825,14 +922,14 @@ class EyeTrackerClient(threading.Thread):
         self._gaze_cb = None
 
     def get_pupil(self):
-        with nonblocking(self.lock) as locked:
-            if locked:
-                return self.pupil
+        if self._listener_process:
+            return self._listener_process.get_pupil()
+        return self.pupil
 
     def get_gaze(self):
-        with nonblocking(self.lock) as locked:
-            if locked:
-                return self.gaze
+        if self._listener_process:
+            return self._listener_process.get_gaze()
+        return self.gaze
 
 
     def get_marker_dictionary(self, ref_list):
@@ -857,125 +954,6 @@ class EyeTrackerClient(threading.Thread):
         return markers_dict
 
 
-    def assign_gaze_to_markers(self, gaze_list, markers_dict):
-        '''
-        Assign gaze to markers based on their timestamp
-        '''
-        i = 0
-        #print(markers_dict[0]['onset'], fixation_list[0]['timestamp'])
-        for count in range(len(markers_dict.keys())):
-            marker = markers_dict[count]
-            gaze_data = {'timestamps': [],
-                         'norm_pos': [],
-                         'confidence': [],
-                        }
-
-            while i < len(gaze_list) and gaze_list[i]['timestamp'] < marker['onset']:
-                i += 1
-
-            while i < len(gaze_list) and gaze_list[i]['timestamp'] < marker['offset']:
-                gaze = gaze_list[i]
-                gaze_data['timestamps'].append(gaze['timestamp'])
-                gaze_data['norm_pos'].append(gaze['norm_pos'])
-                gaze_data['confidence'].append(gaze['confidence'])
-                i += 1
-
-            markers_dict[count]['gaze_data'] = gaze_data
-
-        return markers_dict
-
-
-    def gaze_qc_per_marker(self, markers_dict, frames_per_marker, conf_thresh = 0.80):
-        '''
-        estimated eye-to-screen distance in pixels
-        based on screen dim in pixels ((1280, 1024)) and screen deg of visual angle (17.5, 14)
-        '''
-        dist_in_pix = 4164 # in pixels
-
-        val_qc = []
-        #print('Distance between gaze and target in degrees of visual angle')
-        #print('Good < 0.5 deg ; Fair = [0.5, 1.5[ deg ; Poor >= 1.5 deg')
-
-        for count in range(len(markers_dict.keys())):
-            m = markers_dict[count]
-            #print(f"Marker {count}, Normalized position: {m['norm_pos']}")
-
-            num_gz = len(m['gaze_data']['timestamps'])
-            expected_gz_count = 250*(frames_per_marker/60)
-
-            if num_gz:
-                # transform marker's normalized position into dim = (3,) vector in pixel space
-                m_vecpos = np.concatenate(((np.array(m['norm_pos']) - 0.5)*(1280, 1024), np.array([dist_in_pix])), axis=0)
-
-                g_conf = np.array(m['gaze_data']['confidence'])
-                # filtrate gaze based on confidence threshold
-                g_filter = g_conf > conf_thresh
-                g_pos = np.array(m['gaze_data']['norm_pos'])[g_filter]
-                g_times = np.array(m['gaze_data']['timestamps'])[g_filter]
-
-                gaze = (g_pos - 0.5)*(1280, 1024)
-                gaze_vecpos = np.concatenate((gaze, np.repeat(dist_in_pix, len(gaze)).reshape((-1, 1))), axis=1)
-
-                distances = []
-                for gz_vec in gaze_vecpos:
-                    vectors = np.stack((m_vecpos, gz_vec), axis=0)
-                    distance = np.rad2deg(np.arccos(1.0 - pdist(vectors, metric='cosine')))
-                    distances.append(distance[0])
-
-                distances = np.array(distances)
-                markers_dict[count]['gaze_data']['distances'] = {'distances': distances,
-                                                                 'timestamps': g_times,
-                                                                 }
-
-                num_dist = len(distances)
-                good = np.sum(distances < 0.5) / num_dist
-                fair = np.sum((distances >= 0.5)*(distances < 1.5)) / num_dist
-                poor = np.sum(distances >= 1.5) / num_dist
-
-                #print('Total gaze:' + str(num_gz) + ' , Good:' + str(good) + ' , Fair:' + str(fair) + ' , Poor:' + str(poor))
-                val_qc.append({
-                    'marker': count,
-                    'norm_pos': m['norm_pos'],
-                    'num_gz': num_gz,
-                    'gz_count_ratio': num_gz/expected_gz_count,
-                    'above_70conf_ratio': np.sum(g_conf > 0.7)/num_gz,
-                    'above_80conf_ratio': np.sum(g_conf > 0.8)/num_gz,
-                    'above_90conf_ratio': np.sum(g_conf > 0.9)/num_gz,
-                    'median_distance': np.median(distances),
-                    'good': good,
-                    'fair': fair,
-                    'poor': poor,
-                })
-            else:
-                val_qc.append({
-                    'marker': count,
-                    'norm_pos': m['norm_pos'],
-                    'num_gz': 0,
-                })
-
-        def abc_mapping(val_num, cutoff_vals):
-            if val_num > cutoff_vals[0]:
-                return 'A'
-            elif val_num > cutoff_vals[1]:
-                return 'B'
-            else:
-                return 'C'
-
-        print('EYE-TRACKING VALIDATION METRICS (per marker)')
-        print(f"RATIO OF DETECTED PUPILS: {[round(x['gz_count_ratio'], 3) for x in val_qc if 'gz_count_ratio' in x]}")
-        print(f"CONFIDENCE >0.7 RATIO: {[round(x['above_70conf_ratio'], 3) for x in val_qc if 'above_70conf_ratio' in x]}")
-        print(f"CONFIDENCE >0.8 RATIO: {[round(x['above_80conf_ratio'], 3) for x in val_qc if 'above_80conf_ratio' in x]}")
-        print(f"CONFIDENCE >0.9 RATIO: {[round(x['above_90conf_ratio'], 3) for x in val_qc if 'above_90conf_ratio' in x]}")
-        print(f"MEDIAN DISTANCE 2 TARGET (deg of visual angle): {[round(x['median_distance'], 3) for x in val_qc if 'median_distance' in x]}")
-        print('****************QUICK SUMMARY*********************')
-        print(f"PUPIL DETECTION: {[abc_mapping(x['gz_count_ratio'], [0.97, 0.95]) for x in val_qc if 'gz_count_ratio' in x]}")
-        print(f">70% CONF: {[abc_mapping(x['above_70conf_ratio'], [0.90, 0.80]) for x in val_qc if 'above_70conf_ratio' in x]}")
-        print(f">80% CONF: {[abc_mapping(x['above_80conf_ratio'], [0.85, 0.75]) for x in val_qc if 'above_80conf_ratio' in x]}")
-        print(f"DISTANCE: {[abc_mapping(x['median_distance']*(-1), [-1.2, -2.2]) for x in val_qc if 'median_distance' in x]}")
-
-        return markers_dict, val_qc
-
-
     def interleave_calibration(self, tasks):
         calibration_index=0
         for task in tasks:
@@ -1027,16 +1005,37 @@ class EyeTrackerClient(threading.Thread):
         logging.info("calibration data sent to pupil")
         logging.flush()
 
-    def validate(self, gaze_list, ref_list, frames_per_marker):
-
-        markers_dict = self.get_marker_dictionary(ref_list)
-        markers_dict = self.assign_gaze_to_markers(gaze_list, markers_dict)
-        markers_dict, val_qc = self.gaze_qc_per_marker(markers_dict,
-                                                       frames_per_marker,
-                                                       conf_thresh = 0.80,
-                                                       )
+def print_val_qc(val_qc):
+    def abc_mapping(val_num, cutoff_vals):
+        if val_num > cutoff_vals[0]:
+            return 'A'
+        elif val_num > cutoff_vals[1]:
+            return 'B'
+        else:
+            return 'C'
+
+    print('EYE-TRACKING VALIDATION METRICS (per marker)')
+    print(f"RATIO OF DETECTED PUPILS: {[round(x['gz_count_ratio'], 3) for x in val_qc if 'gz_count_ratio' in x]}")
+    print(f"CONFIDENCE >0.7 RATIO: {[round(x['above_70conf_ratio'], 3) for x in val_qc if 'above_70conf_ratio' in x]}")
+    print(f"CONFIDENCE >0.8 RATIO: {[round(x['above_80conf_ratio'], 3) for x in val_qc if 'above_80conf_ratio' in x]}")
+    print(f"CONFIDENCE >0.9 RATIO: {[round(x['above_90conf_ratio'], 3) for x in val_qc if 'above_90conf_ratio' in x]}")
+    print(f"MEDIAN DISTANCE 2 TARGET (deg of visual angle): {[round(x['median_distance'], 3) for x in val_qc if 'median_distance' in x]}")
+    print('****************QUICK SUMMARY*********************')
+    print(f"PUPIL DETECTION: {[abc_mapping(x['gz_count_ratio'], [0.97, 0.95]) for x in val_qc if 'gz_count_ratio' in x]}")
+    print(f">70% CONF: {[abc_mapping(x['above_70conf_ratio'], [0.90, 0.80]) for x in val_qc if 'above_70conf_ratio' in x]}")
+    print(f">80% CONF: {[abc_mapping(x['above_80conf_ratio'], [0.85, 0.75]) for x in val_qc if 'above_80conf_ratio' in x]}")
+    print(f"DISTANCE: {[abc_mapping(x['median_distance']*(-1), [-1.2, -2.2]) for x in val_qc if 'median_distance' in x]}")
+
+
+def _refs_to_array(ref_list):
+    refs = np.empty(
+        len(ref_list),
+        dtype=[('timestamp', np.float64), ('norm_pos', np.float64, 2), ('screen_pos', np.float64, 2)],
+    )
+    for i, ref in enumerate(ref_list):
+        refs[i] = (ref['timestamp'], ref['norm_pos'], ref['screen_pos'])
+    return refs
 
-        return val_qc
 
 class GazeDrawer:
     def __init__(self, win):
@@ -1067,16 +1066,3 @@ def read_pl_data(fname):
     with open(fname, "rb") as fh:
         for data in msgpack.Unpacker(fh, raw=False, use_list=False):
             yield (data)
-
-
-def fixation_dot(win, **kwargs):
-    radius = kwargs.pop('radius', 20)
-    kwargs = {
-        'lineColor': (1,-.5,-.5),
-        'fillColor': (1,1,1),
-        'units': 'pix',
-        **kwargs
-    }
-    circle = visual.Circle(win, lineWidth=radius*.4, **kwargs, radius=radius)
-    dot = visual.Circle(win, units=kwargs["units"], radius=radius*.25, lineWidth=2, fillColor=(-1,-1,-1))
-    return (circle, dot)
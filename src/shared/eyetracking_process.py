@@ -0,0 +1,171 @@
+# eyetracking listener running in a separate process
+# the stimuli process reads the latest gaze/pupil from shared memory without locking
+
+import os
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+import msgpack
+import zmq
+
+from .sample_buffer import PUPIL_DTYPE, GAZE_SAMPLE_DTYPE, pupil_row, gaze_row
+
+# latest samples, guarded by a sequence counter (odd while being written)
+LATEST_DTYPE = np.dtype(
+    [
+        ("seq", np.uint64),
+        ("n_gaze", np.int64),
+        ("n_pupil", np.int64),
+        ("gaze", GAZE_SAMPLE_DTYPE),
+        ("pupil", PUPIL_DTYPE),
+    ]
+)
+
+# 3 hours at 250Hz
+RECORD_CAPACITY = 250 * 60 * 60 * 3
+
+POLL_TIMEOUT_MS = 10
+SEQLOCK_MAX_RETRIES = 100
+
+TOPICS = ("gaze", "pupil")
+
+
+def _listener_main(sub_url, shm_name, gaze_fname, pupil_fname, capacity, stop_event):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    latest = np.ndarray((1,), dtype=LATEST_DTYPE, buffer=shm.buf)
+    gaze_record = np.lib.format.open_memmap(
+        gaze_fname, mode="w+", dtype=GAZE_SAMPLE_DTYPE, shape=(capacity,))
+    pupil_record = np.lib.format.open_memmap(
+        pupil_fname, mode="w+", dtype=PUPIL_DTYPE, shape=(capacity,))
+
+    ctx = zmq.Context()
+    socket = ctx.socket(zmq.SUB)
+    socket.connect(sub_url)
+    for topic in TOPICS:
+        socket.subscribe(topic)
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
+
+    n_gaze = n_pupil = 0
+    try:
+        while not stop_event.is_set():
+            if not poller.poll(POLL_TIMEOUT_MS):
+                continue
+            last_gaze = last_pupil = None
+            while True:
+                try:
+                    frames = socket.recv_multipart(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                topic = frames[0]
+                datum = msgpack.loads(frames[1])
+                if topic.startswith(b"gaze"):
+                    last_gaze = gaze_row(datum)
+                    if n_gaze < capacity:
+                        gaze_record[n_gaze] = last_gaze
+                        n_gaze += 1
+                elif topic.startswith(b"pupil"):
+                    last_pupil = pupil_row(datum)
+                    if n_pupil < capacity:
+                        pupil_record[n_pupil] = last_pupil
+                        n_pupil += 1
+
+            # seqlock write: readers retry if seq is odd or changed while reading
+            latest["seq"] += 1
+            if last_gaze is not None:
+                latest["gaze"] = last_gaze
+            if last_pupil is not None:
+                latest["pupil"] = last_pupil
+            latest["n_gaze"] = n_gaze
+            latest["n_pupil"] = n_pupil
+            latest["seq"] += 1
+    finally:
+        socket.close()
+        ctx.term()
+        del latest
+        shm.close()
+        # keep only the received samples in the final files
+        for fname, record, n in [(gaze_fname, gaze_record, n_gaze), (pupil_fname, pupil_record, n_pupil)]:
+            record.flush()
+            np.save(fname + ".tmp.npy", record[:n])
+            del record
+            os.replace(fname + ".tmp.npy", fname)
+        del gaze_record, pupil_record
+
+
+class EyeTrackerListenerProcess(object):
+    def __init__(self, sub_url, record_dir, capacity=RECORD_CAPACITY):
+        self._shm = shared_memory.SharedMemory(create=True, size=LATEST_DTYPE.itemsize)
+        self._latest = np.ndarray((1,), dtype=LATEST_DTYPE, buffer=self._shm.buf)
+        self._latest[0] = np.zeros((), dtype=LATEST_DTYPE)
+        self._latest["gaze"]["timestamp"] = np.nan
+        self._latest["pupil"]["timestamp"] = np.nan
+
+        self.gaze_fname = os.path.join(record_dir, "gaze_samples.npy")
+        self.pupil_fname = os.path.join(record_dir, "pupil_samples.npy")
+
+        # spawn: do not inherit the GL/psychopy state of the stimuli process
+        mp_ctx = multiprocessing.get_context("spawn")
+        self._stop_event = mp_ctx.Event()
+        self._process = mp_ctx.Process(
+            target=_listener_main,
+            args=(
+                sub_url, self._shm.name, self.gaze_fname, self.pupil_fname,
+                capacity, self._stop_event,
+            ),
+            name="eyetracking_listener",
+            daemon=True,
+        )
+
+    def start(self):
+        self._process.start()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        del self._latest
+        self._shm.close()
+        self._shm.unlink()
+
+    def _read_latest(self):
+        latest = self._latest
+        for _ in range(SEQLOCK_MAX_RETRIES):
+            seq = latest["seq"][0]
+            if seq % 2:
+                continue
+            record = latest[0].copy()
+            if latest["seq"][0] == seq:
+                return record
+        return None
+
+    def get_gaze(self):
+        record = self._read_latest()
+        if record is None or np.isnan(record["gaze"]["timestamp"]):
+            return None
+        gaze = record["gaze"]
+        return {
+            "timestamp": float(gaze["timestamp"]),
+            "norm_pos": (float(gaze["norm_pos_x"]), float(gaze["norm_pos_y"])),
+            "confidence": float(gaze["confidence"]),
+        }
+
+    def get_pupil(self):
+        record = self._read_latest()
+        if record is None or np.isnan(record["pupil"]["timestamp"]):
+            return None
+        pupil = record["pupil"]
+        return {
+            "timestamp": float(pupil["timestamp"]),
+            "norm_pos": (float(pupil["norm_pos_x"]), float(pupil["norm_pos_y"])),
+            "confidence": float(pupil["confidence"]),
+            "diameter": float(pupil["diameter"]),
+        }
+
+    def n_samples(self):
+        record = self._read_latest()
+        if record is None:
+            return None
+        return int(record["n_gaze"]), int(record["n_pupil"])
@@ -0,0 +1,16 @@
+# fixation stimuli shared by tasks, kept out of eyetracking to not import zmq with them
+
+from psychopy import visual
+
+
+def fixation_dot(win, **kwargs):
+    radius = kwargs.pop('radius', 20)
+    kwargs = {
+        'lineColor': (1,-.5,-.5),
+        'fillColor': (1,1,1),
+        'units': 'pix',
+        **kwargs
+    }
+    circle = visual.Circle(win, lineWidth=radius*.4, **kwargs, radius=radius)
+    dot = visual.Circle(win, units=kwargs["units"], radius=radius*.25, lineWidth=2, fillColor=(-1,-1,-1))
+    return (circle, dot)
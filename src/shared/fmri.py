@@ -1,6 +1,8 @@
 from psychopy import core, event, logging
 import time
-from . import utils
+import threading
+import numpy as np
+from . import utils, config
 
 MR_settings = {
     "TR": 2.000,  # duration (sec) per whole-brain volume
@@ -8,7 +10,13 @@ MR_settings = {
     "skip": 0,  # number of volumes lacking a sync pulse at start of scan (for T1 stabilization)
 }
 
+# the keyboard queue timestamps the pulses, polling it more often does not improve their timing
+TTL_POLL_INTERVAL = .005
+# volumes preallocated per run, the table grows if a run is longer
+TTL_TABLE_SIZE = 2048
+
 globalClock = core.Clock()
+ttl_listener = None
 
 
 def get_ttl():
@@ -20,16 +28,170 @@ def get_ttl():
     return False
 
 
+class TTLListener(threading.Thread):
+    """Record the onset of every volume of a run, from a background thread.
+
+    Sync pulses are read from a psychtoolbox keyboard queue, which timestamps
+    keypresses as they arrive: the main loop does not poll for them and their
+    onset does not depend on the frame rate. Without psychtoolbox, pulses are
+    only added by wait_for_ttl. Onsets (core.getTime time) are stored in a
+    preallocated table, the TR is fit online on the volume indices, so that
+    pulses missed by the keyboard do not bias it.
+    """
+
+    def __init__(self, keys=MR_settings["sync"], tr=config.TR):
+        super().__init__(name="ttl_listener", daemon=True)
+        from psychopy.hardware import keyboard
+
+        self.keys = keys
+        self.nominal_tr = tr
+        self._keyboard = keyboard.Keyboard() if keyboard.havePTB else None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.new_run()
+
+    @property
+    def capturing(self):
+        return self._keyboard is not None
+
+    def new_run(self):
+        with self._lock:
+            self._volumes = np.zeros(TTL_TABLE_SIZE, dtype=int)
+            self._onsets = np.full(TTL_TABLE_SIZE, np.nan)
+            self._n = 0
+            self.n_missed = 0
+            # running sums of the fit onset ~ volume
+            self._sums = np.zeros(5)  # n, sum v, sum t, sum v*v, sum v*t
+        if self._keyboard is not None:
+            self._keyboard.clearEvents()
+
+    def _grow(self):
+        size = len(self._onsets)
+        self._volumes = np.concatenate([self._volumes, np.zeros(size, dtype=int)])
+        self._onsets = np.concatenate([self._onsets, np.full(size, np.nan)])
+
+    def add_pulse(self, onset):
+        with self._lock:
+            n = self._n
+            if n:
+                interval = onset - self._onsets[n - 1]
+                # duplicated key events of the same pulse
+                if interval < self.nominal_tr / 2:
+                    return
+                step = max(1, int(round(interval / self._tr())))
+                if step > 1:
+                    self.n_missed += step - 1
+                    logging.warning(f"fmri: {step - 1} TTL missed before {onset:.4f}")
+                volume = self._volumes[n - 1] + step
+            else:
+                volume = 0
+            if n == len(self._onsets):
+                self._grow()
+            self._volumes[n] = volume
+            self._onsets[n] = onset
+            # relative to the first pulse to keep precision with large clock values
+            t = onset - self._onsets[0]
+            self._sums += (1, volume, t, volume * volume, volume * t)
+            self._n = n + 1
+
+    def _tr(self):
+        n, sv, st, svv, svt = self._sums
+        denominator = n * svv - sv * sv
+        if n < 2 or denominator == 0:
+            return self.nominal_tr
+        return (n * svt - sv * st) / denominator
+
+    @property
+    def tr(self):
+        """Effective TR, fit on the onsets of the run."""
+        with self._lock:
+            return self._tr()
+
+    @property
+    def drift(self):
+        """Relative difference of the effective TR with config.TR."""
+        return self.tr / self.nominal_tr - 1
+
+    def __len__(self):
+        return self._n
+
+    def volume_time(self, volume):
+        """Onset of a volume, predicted from the fit if it was not recorded."""
+        with self._lock:
+            n = self._n
+            if not n:
+                return np.nan
+            idx = np.searchsorted(self._volumes[:n], volume)
+            if idx < n and self._volumes[idx] == volume:
+                return self._onsets[idx]
+            sn, sv, st = self._sums[:3]
+            tr = self._tr()
+            return self._onsets[0] + (st - tr * sv) / sn + tr * volume
+
+    def run(self):
+        if self._keyboard is None:
+            return
+        while not self._stop_event.wait(TTL_POLL_INTERVAL):
+            for key in self._keyboard.getKeys(keyList=self.keys, waitRelease=False):
+                self.add_pulse(key.tDown)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def save(self, fname, time_offset=0):
+        """Save the volumes of the run, onsets relative to time_offset."""
+        import pandas
+
+        with self._lock:
+            n = self._n
+            onsets = self._onsets[:n] - time_offset
+            pandas.DataFrame(
+                {
+                    "volume": self._volumes[:n],
+                    "onset": onsets,
+                    "interval": np.ediff1d(onsets, to_begin=np.nan),
+                }
+            ).to_csv(fname, sep="\t", index=False)
+        logging.exp(
+            msg=f"fmri: {n} TTL, {self.n_missed} missed, TR {self.tr:.5f}s, "
+            f"drift {self.drift * 1e6:.1f}ppm"
+        )
+
+
+def get_ttl_listener():
+    global ttl_listener
+    if ttl_listener is None:
+        ttl_listener = TTLListener()
+        ttl_listener.start()
+    return ttl_listener
+
+
+def close():
+    global ttl_listener
+    if ttl_listener is not None:
+        ttl_listener.stop()
+        ttl_listener = None
+
+
 # blocking function (iterator)
 def wait_for_ttl():
     get_ttl()  # flush any remaining TTL keys
-    ttl_index = 0
+    listener = get_ttl_listener()
+    listener.new_run()
     logging.exp(msg="waiting for fMRI TTL")
     while True:
+        # return at the first of the window key or the listener, the listener
+        # records the keyboard queue time of the pulse in the background
         if get_ttl():
-            # TODO: log real timing of TTL?
-            logging.exp(msg="fMRI TTL %d" % ttl_index)
-            ttl_index += 1
+            ttl_time = core.getTime()
+            if not listener.capturing:
+                listener.add_pulse(ttl_time)
+            logging.exp(msg="fMRI TTL 0 received at %f" % ttl_time)
+            return
+        if len(listener):
+            logging.exp(msg="fMRI TTL 0 at %f" % listener.volume_time(0))
             return
         time.sleep(0.0005)  # just to avoid looping to fast
         yield
@@ -0,0 +1,103 @@
+# stimulus for streams of frames (emulators, cameras) drawn at screen rate
+
+import ctypes
+import numpy as np
+import pyglet
+
+GL = pyglet.gl
+
+
+class GameFrameStim(object):
+    """Draw RGB uint8 frames from a persistent texture updated in place.
+
+    Frames are expected top row first (as returned by retro or decoded images),
+    the vertical flip is done through texture coordinates, so a frame is never
+    copied nor converted before being uploaded with glTexSubImage2D.
+    The texture is allocated once per window the stimulus is drawn in.
+    """
+
+    def __init__(self, win, frame_shape, size, pos=(0, 0), interpolate=False):
+        self.win = win
+        self.frame_height, self.frame_width = frame_shape[:2]
+        self.size = size
+        self.pos = pos
+        self._filter = GL.GL_LINEAR if interpolate else GL.GL_NEAREST
+        self._frame = None
+        self._frame_idx = 0
+        # per window: [texture id, index of the last uploaded frame]
+        self._textures = {}
+
+    def set_frame(self, frame):
+        # only keep a reference, the upload is done at draw time for each window
+        self._frame = frame
+        self._frame_idx += 1
+
+    def _get_texture(self, win):
+        texture = self._textures.get(win)
+        if texture is None:
+            tex_id = GL.GLuint()
+            GL.glGenTextures(1, ctypes.byref(tex_id))
+            GL.glBindTexture(GL.GL_TEXTURE_2D, tex_id)
+            GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, self._filter)
+            GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, self._filter)
+            GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+            GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+            # allocate storage only, frames are uploaded with glTexSubImage2D
+            GL.glTexImage2D(
+                GL.GL_TEXTURE_2D, 0, GL.GL_RGB8,
+                self.frame_width, self.frame_height, 0,
+                GL.GL_RGB, GL.GL_UNSIGNED_BYTE, None,
+            )
+            texture = self._textures[win] = [tex_id, 0]
+        return texture
+
+    def _upload(self, frame):
+        # no-op for contiguous uint8 arrays (the retro observations)
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        GL.glTexSubImage2D(
+            GL.GL_TEXTURE_2D, 0, 0, 0,
+            self.frame_width, self.frame_height,
+            GL.GL_RGB, GL.GL_UNSIGNED_BYTE, frame.ctypes.data,
+        )
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 4)
+
+    def draw(self, win=None):
+        if win is None:
+            win = self.win
+        win._setCurrent()
+
+        texture = self._get_texture(win)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, texture[0])
+        if self._frame is not None and texture[1] != self._frame_idx:
+            self._upload(self._frame)
+            texture[1] = self._frame_idx
+
+        x0 = self.pos[0] - self.size[0] / 2.
+        x1 = self.pos[0] + self.size[0] / 2.
+        y0 = self.pos[1] - self.size[1] / 2.
+        y1 = self.pos[1] + self.size[1] / 2.
+
+        GL.glUseProgram(0)
+        GL.glEnable(GL.GL_TEXTURE_2D)
+        GL.glColor4f(1, 1, 1, 1)
+        GL.glBegin(GL.GL_QUADS)
+        # first row of the frame is at t=0: map it to the top of the quad
+        GL.glTexCoord2f(0, 1)
+        GL.glVertex2f(x0, y0)
+        GL.glTexCoord2f(1, 1)
+        GL.glVertex2f(x1, y0)
+        GL.glTexCoord2f(1, 0)
+        GL.glVertex2f(x1, y1)
+        GL.glTexCoord2f(0, 0)
+        GL.glVertex2f(x0, y1)
+        GL.glEnd()
+        GL.glDisable(GL.GL_TEXTURE_2D)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+
+    def release(self):
+        for win, texture in self._textures.items():
+            win._setCurrent()
+            GL.glDeleteTextures(1, ctypes.byref(texture[0]))
+        self._textures.clear()
+        self._frame = None
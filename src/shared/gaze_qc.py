@@ -0,0 +1,160 @@
+# eyetracking validation: angular error between gaze and calibration targets
+
+import math
+import threading
+import collections
+import numpy as np
+from psychopy import logging
+
+# estimated eye-to-screen distance in pixels
+# based on screen dim in pixels ((1280, 1024)) and screen deg of visual angle (17.5, 14)
+SCREEN_SIZE_PIX = (1280, 1024)
+EYE_TO_SCREEN_PIX = 4164
+
+GAZE_SAMPLING_RATE = 250
+
+CONFIDENCE_LEVELS = (0.7, 0.8, 0.9)
+# Good < 0.5 deg ; Fair = [0.5, 1.5[ deg ; Poor >= 1.5 deg
+DISTANCE_CUTOFFS = (0.5, 1.5)
+
+
+def _to_vectors(norm_x, norm_y):
+    x = (norm_x - 0.5) * SCREEN_SIZE_PIX[0]
+    y = (norm_y - 0.5) * SCREEN_SIZE_PIX[1]
+    return x, y
+
+
+def _marker_stats(num_gz, conf_counts, distances, expected_gz_count):
+    num_dist = len(distances)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "gz_count_ratio": num_gz / expected_gz_count,
+            "above_70conf_ratio": conf_counts[0] / num_gz,
+            "above_80conf_ratio": conf_counts[1] / num_gz,
+            "above_90conf_ratio": conf_counts[2] / num_gz,
+            "median_distance": np.median(distances) if num_dist else np.nan,
+            "good": np.sum(distances < DISTANCE_CUTOFFS[0]) / num_dist,
+            "fair": np.sum(
+                (distances >= DISTANCE_CUTOFFS[0]) * (distances < DISTANCE_CUTOFFS[1])
+            ) / num_dist,
+            "poor": np.sum(distances >= DISTANCE_CUTOFFS[1]) / num_dist,
+        }
+
+
+class StreamingGazeQC(object):
+    """Per-marker validation statistics updated as gaze is received.
+
+    Markers are opened by the task with add_ref (same references as sent for
+    calibration): a marker spans from its first to its last reference timestamp.
+    Gaze samples (from the eyetracker listener thread) that cannot be assigned
+    yet are kept pending until the marker window is known to cover them.
+    Angular errors are kept for at most max_samples_per_marker samples per
+    marker, samples past it are counted as truncated.
+    """
+
+    def __init__(self, conf_thresh=0.8, max_samples_per_marker=GAZE_SAMPLING_RATE * 10):
+        self.conf_thresh = conf_thresh
+        self._max_samples = max_samples_per_marker
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._markers = []  # [x, y, vector norm, norm_pos, onset, offset]
+        self._current = 0  # index of the marker gaze is currently assigned to
+        self._finished = False
+
+        self._num_gz = []
+        self._conf_counts = []
+        self._distances = []
+        self._n_distances = []
+        self._n_truncated = []
+
+    def add_ref(self, marker, norm_pos, timestamp):
+        with self._lock:
+            if marker == len(self._markers):
+                d2 = EYE_TO_SCREEN_PIX ** 2
+                mx, my = _to_vectors(norm_pos[0], norm_pos[1])
+                self._markers.append(
+                    [mx, my, math.sqrt(mx ** 2 + my ** 2 + d2), norm_pos, timestamp, timestamp]
+                )
+                self._num_gz.append(0)
+                self._conf_counts.append([0] * len(CONFIDENCE_LEVELS))
+                self._distances.append(np.empty(self._max_samples))
+                self._n_distances.append(0)
+                self._n_truncated.append(0)
+            else:
+                self._markers[marker][5] = timestamp
+            self._process()
+
+    def add_gaze(self, gaze):
+        with self._lock:
+            self._pending.append(
+                (gaze["timestamp"], gaze["norm_pos"][0], gaze["norm_pos"][1], gaze["confidence"])
+            )
+            self._process()
+
+    def finish(self):
+        # no more references, assign or drop what remains
+        with self._lock:
+            self._finished = True
+            self._process()
+
+    def _process(self):
+        while self._pending and self._current < len(self._markers):
+            ts = self._pending[0][0]
+            mx, my, m_norm, _, onset, offset = self._markers[self._current]
+            marker_closed = self._finished or self._current + 1 < len(self._markers)
+            if ts < onset:
+                # between markers
+                self._pending.popleft()
+            elif ts < offset:
+                self._add_sample(self._current, mx, my, m_norm, *self._pending.popleft())
+            elif marker_closed:
+                self._current += 1
+            else:
+                # the marker might still be extended by upcoming references
+                break
+        if self._finished:
+            self._pending.clear()
+
+    def _add_sample(self, marker, mx, my, m_norm, ts, norm_x, norm_y, conf):
+        self._num_gz[marker] += 1
+        for i, c in enumerate(CONFIDENCE_LEVELS):
+            if conf > c:
+                self._conf_counts[marker][i] += 1
+        if conf <= self.conf_thresh:
+            return
+        n = self._n_distances[marker]
+        if n == self._max_samples:
+            self._n_truncated[marker] += 1
+            return
+        gx, gy = _to_vectors(norm_x, norm_y)
+        d2 = EYE_TO_SCREEN_PIX ** 2
+        cos = (gx * mx + gy * my + d2) / (math.sqrt(gx ** 2 + gy ** 2 + d2) * m_norm)
+        self._distances[marker][n] = math.degrees(math.acos(max(-1., min(1., cos))))
+        self._n_distances[marker] = n + 1
+
+    def summary(self, frames_per_marker):
+        expected_gz_count = GAZE_SAMPLING_RATE * (frames_per_marker / 60)
+        val_qc = []
+        with self._lock:
+            for marker, m in enumerate(self._markers):
+                qc = {
+                    "marker": marker,
+                    "norm_pos": m[3],
+                    "num_gz": self._num_gz[marker],
+                    "truncated": self._n_truncated[marker],
+                }
+                if self._num_gz[marker]:
+                    qc.update(_marker_stats(
+                        self._num_gz[marker],
+                        self._conf_counts[marker],
+                        self._distances[marker][: self._n_distances[marker]],
+                        expected_gz_count,
+                    ))
+                val_qc.append(qc)
+        truncated = [qc["marker"] for qc in val_qc if qc["truncated"]]
+        if truncated:
+            logging.warning(
+                f"gaze_qc: markers {truncated} had more than {self._max_samples} samples, "
+                "statistics are computed on the first ones"
+            )
+        return val_qc
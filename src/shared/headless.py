@@ -0,0 +1,75 @@
+# windows rendered offscreen, to run sessions without a display (CI, benchmarks)
+# main.py --headless sets pyglet in headless mode (EGL, eg. mesa llvmpipe) before psychopy is imported
+#   vsync: flips are paced by a simulated vsync at config.FRAME_RATE
+#   free: flips return right away and never block; task clocks and waits stay on real time,
+#   so sessions still take their wall-clock duration. Running faster than real time would need
+#   a virtual clock shared by psychopy's clocks, the deadline waits and the listener/trigger
+#   threads, which is out of scope: free mode only removes the vsync pacing of flips
+
+import time
+
+from psychopy import visual, core, logging
+
+from . import config
+
+HEADLESS_MODES = ("vsync", "free")
+
+
+def window_kwargs(kwargs):
+    # an offscreen window has no screen, display mode nor gamma ramp
+    kwargs = dict(kwargs)
+    kwargs.pop("pos", None)
+    kwargs.update(
+        fullscr=False,
+        screen=0,
+        waitBlanking=False,
+        checkTiming=False,
+        gammaErrorPolicy="warn",
+    )
+    return kwargs
+
+
+class HeadlessWindow(visual.Window):
+    """psychopy Window without a display, flipping on a simulated vsync or free-running.
+
+    In vsync mode, flip waits for the next refresh of a frame grid started at
+    the first flip; late flips wait for the next refresh on the grid, as
+    they would on a display, and are counted as dropped. In free mode, flips
+    do not block, tasks still wait for their deadlines on the real clock.
+    Windows created with waitBlanking=False (eg. the control window) are
+    never paced.
+    """
+
+    def __init__(self, *args, vsync=True, frame_rate=config.FRAME_RATE, **kwargs):
+        # set first, psychopy flips while initializing the window
+        self.vsync = vsync and kwargs.get("waitBlanking", True)
+        self._next_vsync = None
+        self.n_flips = self.n_dropped = 0
+        super().__init__(*args, **window_kwargs(kwargs))
+        self.monitorFramePeriod = 1. / frame_rate
+        # the frame grid starts at the first flip of the session
+        self._next_vsync = None
+        self.n_flips = self.n_dropped = 0
+
+    def _wait_vsync(self):
+        period = self.monitorFramePeriod
+        now = core.getTime()
+        if self._next_vsync is None:
+            self._next_vsync = now
+        elif now > self._next_vsync:
+            n_missed = int((now - self._next_vsync) // period) + 1
+            self.n_dropped += n_missed
+            self._next_vsync += n_missed * period
+        if self._next_vsync > now:
+            time.sleep(self._next_vsync - now)
+        self._next_vsync += period
+
+    def flip(self, clearBuffer=True):
+        if self.vsync:
+            self._wait_vsync()
+        self.n_flips += 1
+        return super().flip(clearBuffer=clearBuffer)
+
+    def report(self):
+        mode = "vsync" if self.vsync else "free"
+        logging.exp(f"headless window {self.name} ({mode}): {self.n_flips} flips, {self.n_dropped} dropped")
@@ -0,0 +1,106 @@
+# decode stimuli images ahead of time on worker threads
+
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+from psychopy import logging
+
+PREFETCH_WORKERS = 2
+# max memory used by decoded images, least recently used images are evicted first
+MEMORY_BUDGET = 512 * 1024 ** 2
+
+
+def decode_image(path):
+    im = Image.open(path)
+    # force decoding now, PIL opens files lazily
+    im.load()
+    # same modes as kept by psychopy when loading from a file
+    if im.mode not in ("RGB", "RGBA", "L"):
+        im = im.convert("RGBA")
+    return im
+
+
+def _image_nbytes(im):
+    return im.width * im.height * len(im.getbands())
+
+
+class ImagePrefetcher(object):
+    """LRU cache of decoded images filled by a thread pool.
+
+    Tasks call prefetch() with upcoming stimuli as soon as they are known and
+    get() right before drawing: the returned PIL image is assigned to an
+    ImageStim without reading nor decoding the file in the trial timing window.
+    """
+
+    def __init__(self, n_workers=PREFETCH_WORKERS, memory_budget=MEMORY_BUDGET):
+        self._executor = ThreadPoolExecutor(
+            max_workers=n_workers, thread_name_prefix="image_prefetch"
+        )
+        self._memory_budget = memory_budget
+        self._cache = collections.OrderedDict()  # path -> Future
+        self._nbytes = {}
+        # reentrant: done callbacks run in the caller thread if already decoded
+        self._lock = threading.RLock()
+        self.n_hits = self.n_misses = 0
+
+    def prefetch(self, paths):
+        with self._lock:
+            for path in paths:
+                if path in self._cache:
+                    self._cache.move_to_end(path)
+                    continue
+                future = self._executor.submit(decode_image, path)
+                future.add_done_callback(lambda f, path=path: self._decoded(path, f))
+                self._cache[path] = future
+
+    def _decoded(self, path, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self._lock:
+            if self._cache.get(path) is future:
+                self._nbytes[path] = _image_nbytes(future.result())
+                self._evict()
+
+    def _evict(self):
+        # drop least recently used decoded images until under budget, keep pending ones
+        total = sum(self._nbytes.values())
+        for path in list(self._cache.keys()):
+            if total <= self._memory_budget:
+                break
+            if path in self._nbytes:
+                total -= self._nbytes.pop(path)
+                del self._cache[path]
+
+    def get(self, path):
+        with self._lock:
+            future = self._cache.get(path)
+            if future is None:
+                future = self._executor.submit(decode_image, path)
+                future.add_done_callback(lambda f, path=path: self._decoded(path, f))
+                self._cache[path] = future
+                hit = False
+            else:
+                self._cache.move_to_end(path)
+                hit = future.done()
+        if hit:
+            self.n_hits += 1
+        else:
+            self.n_misses += 1
+            logging.warning(f"image_cache: {path} not ready, decoding on demand")
+        return future.result()
+
+    def memory_used(self):
+        with self._lock:
+            return sum(self._nbytes.values())
+
+    def close(self):
+        logging.exp(
+            f"image_cache: {self.n_hits} hits, {self.n_misses} misses, "
+            f"{self.memory_used() / 1024 ** 2:.1f}MB"
+        )
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._cache.clear()
+            self._nbytes.clear()
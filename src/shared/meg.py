@@ -1,6 +1,4 @@
-from psychopy import parallel
-from . import config
-import time
+from . import config, triggers
 
 MEG_MARKERS_ON_FLIP = True
 
@@ -12,25 +10,33 @@ MEG_settings = {
     "TASK_FLIP": int("000000010", 2),
 }
 
-port = None
+trigger_output = None
 current_signal = 0
 
+def get_trigger_output():
+    global trigger_output
+    if not trigger_output:
+        trigger_output = triggers.TriggerScheduler(
+            triggers.open_backend("parallel", config.PARALLEL_PORT_ADDRESS, "meg_triggers"),
+            name="meg_triggers",
+        )
+        trigger_output.start()
+    return trigger_output
+
 def send_signal(data):
-    global port
-    if not port:
-        port = parallel.ParallelPort(address=config.PARALLEL_PORT_ADDRESS)
-    start=time.monotonic()
-    port.setData(data)
-    # hog cpu for accurate timing
-    while time.monotonic() < start + MEG_MARKER_DURATION:
-        continue
-    port.setData(0)  # reset
+    # the pulse and its reset are timed by the output thread
+    get_trigger_output().pulse(data, MEG_MARKER_DURATION)
 
 
 def set_trigger_signal():
-    global port, current_signal
-    if not port:
-        port = parallel.ParallelPort(address=config.PARALLEL_PORT_ADDRESS)
+    global current_signal
     new_signal = 0 if current_signal else MEG_settings["TASK_FLIP"]
-    port.setData(new_signal)
+    get_trigger_output().level(new_signal)
     current_signal = new_signal
+
+
+def close():
+    global trigger_output
+    if trigger_output:
+        trigger_output.stop()
+        trigger_output = None
@@ -34,6 +34,11 @@ def parse_args():
     parser.add_argument(
         "--validate_ET", "-v", help="validate eyetracking calibration", action="store_true"
     )
+    parser.add_argument(
+        "--et-listener-process",
+        help="decode eyetracking data in a separate process, latest gaze is read from shared memory",
+        action="store_true",
+    )
     parser.add_argument(
         "--skip-soundcheck", help="Disable soundcheck", action="store_true"
     )
@@ -61,7 +66,20 @@ def parse_args():
         "--ptt", help="enable Push-To-Talk function", action="store_true"
     )
     parser.add_argument("--profile", help="enable profiling", action="store_true")
+    parser.add_argument(
+        "--profile-startup",
+        help="record import, window creation and task setup times in task_stimuli_startup.json",
+        action="store_true",
+    )
     parser.add_argument(
         "--record-movie", help="record a movie of each task", action="store_true"
     )
+    parser.add_argument(
+        "--headless",
+        choices=("vsync", "free"),
+        default=None,
+        help="render offscreen without a display; vsync: flips paced at the frame rate, "
+        "free: flips do not block, waits on task clocks stay on the real clock "
+        "(running faster than real time is not supported)",
+    )
     return parser.parse_args()
@@ -0,0 +1,92 @@
+# growable columnar storage of eyetracking samples
+
+import numpy as np
+
+NAN = float("nan")
+
+PUPIL_DTYPE = np.dtype(
+    [
+        ("timestamp", np.float64),
+        ("norm_pos_x", np.float64),
+        ("norm_pos_y", np.float64),
+        ("confidence", np.float64),
+        ("diameter", np.float64),
+        ("ellipse_center_x", np.float64),
+        ("ellipse_center_y", np.float64),
+        ("ellipse_axis_a", np.float64),
+        ("ellipse_axis_b", np.float64),
+        ("ellipse_angle", np.float64),
+    ]
+)
+
+GAZE_SAMPLE_DTYPE = np.dtype(
+    [
+        ("timestamp", np.float64),
+        ("norm_pos_x", np.float64),
+        ("norm_pos_y", np.float64),
+        ("confidence", np.float64),
+    ]
+)
+
+# 1 min at the eyetracker rate of 250Hz
+DEFAULT_CAPACITY = 250 * 60
+
+
+def pupil_row(pupil):
+    ellipse = pupil.get("ellipse") or {}
+    center = ellipse.get("center", (NAN, NAN))
+    axes = ellipse.get("axes", (NAN, NAN))
+    return (
+        pupil["timestamp"],
+        pupil["norm_pos"][0],
+        pupil["norm_pos"][1],
+        pupil["confidence"],
+        pupil.get("diameter", NAN),
+        center[0],
+        center[1],
+        axes[0],
+        axes[1],
+        ellipse.get("angle", NAN),
+    )
+
+
+def gaze_row(gaze):
+    return (
+        gaze["timestamp"],
+        gaze["norm_pos"][0],
+        gaze["norm_pos"][1],
+        gaze["confidence"],
+    )
+
+
+class SampleBuffer(object):
+    """Typed columns filled one sample at a time, doubling capacity when full.
+
+    Appends are only done by one thread (the eyetracker listener), readers
+    only use `data` which is a view on the samples appended so far.
+    """
+
+    def __init__(self, dtype, capacity=DEFAULT_CAPACITY):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row):
+        if self._size == len(self._data):
+            grown = np.empty(len(self._data) * 2, dtype=self._data.dtype)
+            grown[: self._size] = self._data
+            self._data = grown
+        self._data[self._size] = row
+        self._size += 1
+
+    @property
+    def data(self):
+        return self._data[: self._size]
+
+    def __getitem__(self, field):
+        return self.data[field]
+
+    def clear(self):
+        self._size = 0
@@ -0,0 +1,63 @@
+# design onsets compiled to target flips at setup, instead of deadlines computed trial by trial
+
+import numpy as np
+from psychopy import logging
+
+from . import config
+
+# onsets presented further than this from their design time are reported
+ONSET_TOLERANCE = .001
+
+
+def refresh_interval(win):
+    """Refresh interval measured by psychopy when opening the window, else the configured one."""
+    period = getattr(win, "monitorFramePeriod", None)
+    return period if period else 1. / config.FRAME_RATE
+
+
+class FlipSchedule(object):
+    """Target flips and wait deadlines of the onsets of a design.
+
+    Onsets are on the task clock, 0 at the first flip of the run, and can be
+    of any shape, in presentation order when flattened. Each one is rounded
+    to the closest flip of the refresh interval: waiting for deadlines[idx],
+    `lead` of a refresh before flip_times[idx], then flipping presents the
+    event on its target flip.
+    """
+
+    def __init__(self, onsets, interval, lead=.5, tolerance=ONSET_TOLERANCE):
+        self.onsets = np.asarray(onsets, dtype=float)
+        self.interval = interval
+        self.tolerance = tolerance
+        self.flips = np.rint(self.onsets / interval).astype(int)
+        self.flip_times = self.flips * interval
+        self.deadlines = self.flip_times - lead * interval
+        # presented - design onset
+        self.errors = self.flip_times - self.onsets
+
+    def __len__(self):
+        return self.onsets.size
+
+    def validate(self, name=""):
+        """Log and return onsets that cannot be presented at their design time."""
+        errors = self.errors.ravel()
+        flips = self.flips.ravel()
+        inexact = np.flatnonzero(np.abs(errors) > self.tolerance)
+        # successive events on the same flip, the last one replaces the others
+        collisions = np.flatnonzero(np.diff(flips) <= 0) + 1
+        report = {
+            "n_onsets": len(errors),
+            "n_inexact": len(inexact),
+            "n_collisions": len(collisions),
+            "max_error": float(np.abs(errors).max()) if len(errors) else 0.,
+            "inexact": inexact,
+            "collisions": collisions,
+        }
+        logging.exp(
+            f"schedule {name}: {report['n_onsets']} onsets on {self.interval * 1000:.3f}ms flips, "
+            f"{report['n_inexact']} off by more than {self.tolerance * 1000:.1f}ms "
+            f"(max {report['max_error'] * 1000:.2f}ms), {report['n_collisions']} on the same flip"
+        )
+        if len(collisions):
+            logging.warning(f"schedule {name}: onsets {collisions.tolist()} share a flip with the previous one")
+        return report
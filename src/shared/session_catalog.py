@@ -0,0 +1,163 @@
+# registry of the sessions: task modules, task classes and third-party packages each needs
+# built from the sources without importing them, cached until a source file changes
+
+import os
+import sys
+import ast
+import json
+
+SRC_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_FILE = os.path.join(SRC_PATH, "sessions", "__pycache__", "session_catalog.json")
+CATALOG_VERSION = 1
+SOURCE_DIRS = ("sessions", "tasks", "shared")
+# functions of the session modules run when loading the session
+SESSION_FUNCTIONS = ("get_tasks",)
+
+STDLIB_MODULES = set(sys.stdlib_module_names) | set(sys.builtin_module_names)
+
+
+def _source_files():
+    for subdir in SOURCE_DIRS:
+        for fname in sorted(os.listdir(os.path.join(SRC_PATH, subdir))):
+            if fname.endswith(".py"):
+                yield os.path.join(subdir, fname)
+
+
+def _module_name(relpath):
+    return "src." + os.path.splitext(relpath)[0].replace(os.sep, ".")
+
+
+def _signature():
+    return {
+        relpath: os.stat(os.path.join(SRC_PATH, relpath)).st_mtime_ns
+        for relpath in _source_files()
+    }
+
+
+def _import_nodes(nodes, functions=()):
+    # import statements run when importing the module, and when calling `functions`
+    for node in nodes:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            yield node
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if node.name in functions:
+                for sub_node in ast.walk(node):
+                    if isinstance(sub_node, (ast.Import, ast.ImportFrom)):
+                        yield sub_node
+        else:
+            yield from _import_nodes(ast.iter_child_nodes(node), functions)
+
+
+def _parse_module(module, tree, known_modules, functions=()):
+    """src modules, third-party packages and src names imported by a module."""
+    internal, external = set(), set()
+    names = {}  # local name -> imported src module or src module attribute
+    for node in _import_nodes(tree.body, functions):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name in known_modules:
+                    internal.add(alias.name)
+                elif alias.name.split(".")[0] != "src":
+                    external.add(alias.name.split(".")[0])
+            continue
+
+        if node.level:
+            package = module.split(".")[: -node.level]
+            base = ".".join(package + ([node.module] if node.module else []))
+        else:
+            base = node.module
+        if base.split(".")[0] != "src":
+            external.add(base.split(".")[0])
+            continue
+        for alias in node.names:
+            submodule = f"{base}.{alias.name}"
+            if submodule in known_modules:
+                internal.add(submodule)
+                names[alias.asname or alias.name] = submodule
+            elif base in known_modules:
+                internal.add(base)
+                names[alias.asname or alias.name] = f"{base}.{alias.name}"
+    return internal, external - STDLIB_MODULES, names
+
+
+def _task_classes(tree, names, task_modules):
+    classes = {
+        name.rsplit(".", 1)[1]
+        for name in names.values()
+        if name.rsplit(".", 1)[0] in task_modules and name not in task_modules
+    }
+    # classes used as attributes of imported task modules, eg. `robot.CozmoFriends`
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Attribute)
+            and isinstance(node.value, ast.Name)
+            and names.get(node.value.id) in task_modules
+            and node.attr[:1].isupper()
+        ):
+            classes.add(node.attr)
+    return classes
+
+
+def build():
+    sources = {_module_name(relpath): relpath for relpath in _source_files()}
+    known_modules = set(sources) | {"src", "src.sessions", "src.tasks", "src.shared"}
+    task_modules = {m for m in sources if m.startswith("src.tasks.")}
+
+    trees, imports = {}, {}
+    for module, relpath in sources.items():
+        with open(os.path.join(SRC_PATH, relpath), "rb") as f:
+            trees[module] = ast.parse(f.read(), filename=relpath)
+        functions = SESSION_FUNCTIONS if module.startswith("src.sessions.") else ()
+        imports[module] = _parse_module(module, trees[module], known_modules, functions)
+
+    dependencies = {}
+
+    def _dependencies(module, visiting=()):
+        # third-party packages imported, directly or through other src modules
+        if module in dependencies:
+            return dependencies[module]
+        internal, external, _ = imports.get(module, (set(), set(), {}))
+        deps = set(external)
+        for sub_module in internal - set(visiting) - {module}:
+            deps |= _dependencies(sub_module, visiting + (module,))
+        if not visiting:
+            dependencies[module] = deps
+        return deps
+
+    sessions = {}
+    for module, relpath in sources.items():
+        if not module.startswith("src.sessions.ses-"):
+            continue
+        internal, _, names = imports[module]
+        sessions[module[len("src.sessions.ses-"):]] = {
+            "module": module,
+            "task_modules": sorted(internal & task_modules),
+            "task_classes": sorted(_task_classes(trees[module], names, task_modules)),
+            "dependencies": sorted(_dependencies(module)),
+        }
+    return sessions
+
+
+def load():
+    """Catalog of the sessions, rebuilt only if a source file changed."""
+    signature = _signature()
+    try:
+        with open(CACHE_FILE) as f:
+            cache = json.load(f)
+        if cache["version"] == CATALOG_VERSION and cache["signature"] == signature:
+            return cache["sessions"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sessions = build()
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        with open(CACHE_FILE + ".tmp", "w") as f:
+            json.dump(
+                {"version": CATALOG_VERSION, "signature": signature, "sessions": sessions}, f
+            )
+        os.replace(CACHE_FILE + ".tmp", CACHE_FILE)
+    except OSError:
+        # the catalog is then only built for this run
+        pass
+    return sessions
@@ -0,0 +1,235 @@
+# startup profiling: import time of each module as a tree, window creation and task setup times
+# enabled by main.py --profile-startup, before any other import
+#
+# check a report against the startup budget:
+#   python -m src.shared.startup_profile task_stimuli_startup.json [--budget SECONDS]
+# or profile the imports of a session in a fresh interpreter and check them:
+#   python -m src.shared.startup_profile --session things [--budget SECONDS]
+
+import sys
+import time
+import json
+import contextlib
+import importlib.abc
+
+REPORT_FILE = "task_stimuli_startup.json"
+
+_profiler = None
+
+
+class _Node(object):
+    __slots__ = ("name", "start", "duration", "children")
+
+    def __init__(self, name, start):
+        self.name = name
+        self.start = start
+        self.duration = 0.
+        self.children = []
+
+    def to_dict(self):
+        children_duration = sum(child.duration for child in self.children)
+        return {
+            "name": self.name,
+            "start": self.start,
+            "cumulative": self.duration,
+            "self": self.duration - children_duration,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class _TimedLoader(object):
+    """Time exec_module of a wrapped loader, the module keeps the original loader."""
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        with self._profiler._import(module.__name__):
+            self._loader.exec_module(module)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def find_spec(self, name, path, target=None):
+        # delegate to the next finders, only the loader is wrapped
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, self._profiler)
+            return spec
+        return None
+
+
+class StartupProfiler(object):
+    def __init__(self, launch_time):
+        self.launch_time = launch_time
+        self._root = _Node("<startup>", 0.)
+        self._stack = [self._root]
+        self.spans = []
+        self.marks = {}
+        self._finder = _TimingFinder(self)
+
+    def _now(self):
+        return time.perf_counter() - self.launch_time
+
+    @contextlib.contextmanager
+    def _import(self, name):
+        node = _Node(name, self._now())
+        self._stack[-1].children.append(node)
+        self._stack.append(node)
+        try:
+            yield
+        finally:
+            node.duration = self._now() - node.start
+            self._stack.pop()
+
+    def install(self):
+        sys.meta_path.insert(0, self._finder)
+
+    def uninstall(self):
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = self._now()
+        try:
+            yield
+        finally:
+            self.spans.append({"name": name, "start": start, "duration": self._now() - start})
+
+    def mark(self, name):
+        self.marks.setdefault(name, self._now())
+
+    def _find(self, names):
+        # cumulative import time of the selected modules, where first imported
+        found = {}
+        nodes = list(self._root.children)
+        while nodes:
+            node = nodes.pop(0)
+            if node.name in names and node.name not in found:
+                found[node.name] = node.duration
+            nodes.extend(node.children)
+        return found
+
+    def report(self, modules=()):
+        imports = [child.to_dict() for child in self._root.children]
+        return {
+            "imports_duration": sum(child.duration for child in self._root.children),
+            "modules": self._find(set(modules)),
+            "imports": imports,
+            "spans": self.spans,
+            "marks": self.marks,
+            "startup_duration": self.marks.get(
+                "first_frame",
+                max([s["start"] + s["duration"] for s in self.spans] + [self._now()]),
+            ),
+        }
+
+    def save(self, fname=REPORT_FILE, modules=()):
+        with open(fname, "w") as f:
+            json.dump(self.report(modules), f, indent=1)
+
+
+def enable(launch_time):
+    global _profiler
+    if _profiler is None:
+        _profiler = StartupProfiler(launch_time)
+        _profiler.install()
+    return _profiler
+
+
+def get_profiler():
+    return _profiler
+
+
+def span(name):
+    """Time a startup step, a no-op unless profiling is enabled."""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.span(name)
+
+
+def mark(name):
+    if _profiler is not None:
+        _profiler.mark(name)
+
+
+def _profile_session_imports(session):
+    # run in a fresh interpreter: only the imports main.py does before creating windows
+    import os
+    import subprocess
+    import tempfile
+
+    fd, fname = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    code = (
+        "import time; t = time.perf_counter()\n"
+        "from src.shared import startup_profile, session_catalog\n"
+        "p = startup_profile.enable(t)\n"
+        "import importlib\n"
+        "import src.shared.cli\n"
+        f"s = session_catalog.load()[{session!r}]\n"
+        "importlib.import_module(s['module'])\n"
+        "for m in s['task_modules']: importlib.import_module(m)\n"
+        "p.mark('first_frame')\n"
+        f"p.save({fname!r}, ['src.shared.cli', s['module']] + s['task_modules'])\n"
+    )
+    try:
+        subprocess.run([sys.executable, "-c", code], check=True)
+        with open(fname) as f:
+            return json.load(f)
+    finally:
+        os.remove(fname)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="check startup time against a budget, exit with an error if over"
+    )
+    parser.add_argument("report", nargs="?", default=REPORT_FILE, help="startup report")
+    parser.add_argument("--session", help="profile the imports of a session instead of reading a report")
+    parser.add_argument("--budget", type=float, help="seconds, defaults to config.STARTUP_BUDGET")
+    parsed = parser.parse_args()
+
+    if parsed.budget is None:
+        from . import config
+        parsed.budget = config.STARTUP_BUDGET
+
+    if parsed.session:
+        report = _profile_session_imports(parsed.session)
+    else:
+        with open(parsed.report) as f:
+            report = json.load(f)
+
+    for name, duration in sorted(report["modules"].items(), key=lambda m: -m[1]):
+        print(f"{duration:8.3f}s import {name}")
+    for s in report["spans"]:
+        print(f"{s['duration']:8.3f}s {s['name']}")
+    startup = report["startup_duration"]
+    print(f"{startup:8.3f}s startup (budget {parsed.budget:.3f}s)")
+    if startup > parsed.budget:
+        print("startup over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
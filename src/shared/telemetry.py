@@ -0,0 +1,75 @@
+# per-flip timing telemetry for tasks
+
+import numpy as np
+from . import config
+
+# dtype of one flip record
+FRAME_DTYPE = np.dtype(
+    [
+        ("flip_idx", np.int64),
+        ("flip_time", np.float64),  # exp_win flip time (task clock)
+        ("generator_time", np.float64),  # time spent inside the task _run generator
+        ("loop_time", np.float64),  # time spent outside Task.run (run_task_loop overhead)
+        ("dropped", np.bool_),
+    ]
+)
+
+# 10 minutes of flips at the configured frame rate
+DEFAULT_CAPACITY = config.FRAME_RATE * 60 * 10
+
+# a flip interval longer than this many frame periods is counted as a dropped frame
+DROPPED_FRAME_THRESHOLD = 1.5
+
+
+class FrameTelemetry(object):
+    def __init__(self, capacity=DEFAULT_CAPACITY, frame_rate=config.FRAME_RATE):
+        # preallocate once, recording a flip never allocates
+        self._buffer = np.zeros(capacity, dtype=FRAME_DTYPE)
+        self._capacity = capacity
+        self._dropped_threshold = DROPPED_FRAME_THRESHOLD / frame_rate
+        self.reset()
+
+    def reset(self):
+        self._n_records = 0
+        self._last_flip_time = None
+        self.n_dropped = 0
+
+    def __len__(self):
+        return min(self._n_records, self._capacity)
+
+    def record(self, flip_idx, flip_time, generator_time, loop_time):
+        dropped = (
+            self._last_flip_time is not None
+            and flip_time - self._last_flip_time > self._dropped_threshold
+        )
+        self._last_flip_time = flip_time
+        self.n_dropped += dropped
+
+        # single-field writes avoid creating a record tuple per flip
+        idx = self._n_records % self._capacity
+        buf = self._buffer
+        buf["flip_idx"][idx] = flip_idx
+        buf["flip_time"][idx] = flip_time
+        buf["generator_time"][idx] = generator_time
+        buf["loop_time"][idx] = loop_time
+        buf["dropped"][idx] = dropped
+        self._n_records += 1
+        return dropped
+
+    def records(self):
+        # return records in chronological order, unrolling the ring if it wrapped
+        if self._n_records <= self._capacity:
+            return self._buffer[: self._n_records]
+        start = self._n_records % self._capacity
+        return np.concatenate([self._buffer[start:], self._buffer[:start]])
+
+    def save(self, fname):
+        # write as a plain .npy that can be reloaded with np.load(fname, mmap_mode='r')
+        records = self.records()
+        out = np.lib.format.open_memmap(
+            fname, mode="w+", dtype=FRAME_DTYPE, shape=records.shape
+        )
+        out[:] = records
+        out.flush()
+        del out
+        return fname
@@ -0,0 +1,63 @@
+# trial design and results stored as columns, for tasks logging data between flips
+
+import numpy as np
+
+
+def _empty_column(dtype, size):
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f":
+        return np.full(size, np.nan, dtype=dtype)
+    if dtype.kind == "O":
+        return np.full(size, None, dtype=dtype)
+    return np.zeros(size, dtype=dtype)
+
+
+class TrialTable(object):
+    """Design columns as numpy arrays and preallocated typed result columns.
+
+    During the run, results are written by trial index in the arrays returned
+    by table[column], which only costs an array assignment between flips;
+    pandas is only used to build the events file when saving.
+
+    results: dict of result column name to dtype, float results are
+    initialized to NaN, object results (eg. lists of keypresses) to None.
+    """
+
+    def __init__(self, design, results=None):
+        # design: DataFrame, dict of columns or list of trial dicts (TrialHandler conditions)
+        if isinstance(design, (list, tuple)):
+            names = list(design[0].keys()) if len(design) else []
+            design = {name: [trial.get(name) for trial in design] for name in names}
+        self._columns = {name: np.asarray(design[name]) for name in design.keys()}
+        self._size = len(next(iter(self._columns.values()))) if self._columns else 0
+        self._results = dict(results or {})
+        self.reset()
+
+    def reset(self):
+        """(Re)allocate empty result columns, eg. when restarting a task."""
+        for name, dtype in self._results.items():
+            self._columns[name] = _empty_column(dtype, self._size)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, column):
+        return self._columns[column]
+
+    def __contains__(self, column):
+        return column in self._columns
+
+    @property
+    def columns(self):
+        return list(self._columns.keys())
+
+    def row(self, trial_n):
+        return {name: column[trial_n] for name, column in self._columns.items()}
+
+    def to_dataframe(self):
+        import pandas
+
+        return pandas.DataFrame(self._columns)
+
+    def save(self, fname):
+        self.to_dataframe().to_csv(fname, sep="\t", index=False)
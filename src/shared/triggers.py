@@ -0,0 +1,172 @@
+# trigger output on a dedicated thread: pulses requested at flip are set and reset off the render thread
+
+import os
+import time
+import threading
+
+from psychopy import core, logging
+
+from . import config
+
+# the output thread sleeps until SPIN_MARGIN before a reset, then spins to the deadline
+SPIN_MARGIN = .002
+# niceness of the output thread, only applied if permitted
+THREAD_NICE = -10
+
+
+class ParallelBackend(object):
+    def __init__(self, address):
+        from psychopy import parallel
+
+        self._port = parallel.ParallelPort(address=address)
+
+    def write(self, code):
+        self._port.setData(code)
+
+    def close(self):
+        pass
+
+
+class SerialBackend(object):
+    def __init__(self, address):
+        import serial
+
+        self._port = serial.Serial(address)
+
+    def write(self, code):
+        self._port.write(code.to_bytes(1, byteorder='big'))
+
+    def close(self):
+        self._port.close()
+
+
+class LoopbackBackend(object):
+    """Record the codes written with their time, to test without the hardware."""
+
+    def __init__(self, fname=None):
+        self.written = []
+        self._file = None
+        if fname:
+            self._file = open(fname, "w")
+            self._file.write("time\tcode\n")
+
+    def write(self, code):
+        t = core.getTime()
+        self.written.append((t, code))
+        if self._file:
+            self._file.write(f"{t:.6f}\t{code}\n")
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def open_backend(kind, address, name):
+    """Port backend, or a loopback file in config.TRIGGER_LOOPBACK_DIR if set."""
+    if config.TRIGGER_LOOPBACK_DIR:
+        return LoopbackBackend(os.path.join(config.TRIGGER_LOOPBACK_DIR, f"{name}.tsv"))
+    if kind == "parallel":
+        return ParallelBackend(address)
+    if kind == "serial":
+        return SerialBackend(address)
+    raise ValueError(f"unknown trigger backend {kind}")
+
+
+def _raise_priority():
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), THREAD_NICE)
+    except (AttributeError, OSError) as e:
+        logging.warning(f"triggers: could not raise the output thread priority: {e}")
+
+
+class TriggerScheduler(threading.Thread):
+    """Write trigger codes to a backend from a dedicated thread.
+
+    pulse() only queues the code with the request time and returns, so it can
+    be registered with callOnFlip on every flip. The thread writes the code,
+    then resets the port once the pulse duration has elapsed. A pulse requested
+    while another is still up is coalesced: its code is written right away and
+    the reset postponed to the end of the last pulse, so the port is not reset
+    between two pulses shorter than a frame apart.
+    """
+
+    def __init__(self, backend, name="triggers"):
+        super().__init__(name=name, daemon=True)
+        self.backend = backend
+        self._cond = threading.Condition()
+        self._requests = []
+        self._stopping = False
+        self._current = None
+        self._reset_at = None
+        self._reset_value = 0
+        self.n_pulses = self.n_coalesced = 0
+        self.max_latency = 0.
+
+    def pulse(self, code, duration, reset_value=0):
+        with self._cond:
+            self._requests.append((code, duration, reset_value, core.getTime()))
+            self._cond.notify()
+
+    def level(self, code):
+        """Set the port to code until the next request, without reset."""
+        self.pulse(code, None)
+
+    def _write(self, code):
+        if code != self._current:
+            self.backend.write(code)
+            self._current = code
+
+    def _output(self, code, duration, reset_value, t_request):
+        self._write(code)
+        t_written = core.getTime()
+        self.max_latency = max(self.max_latency, t_written - t_request)
+        if duration is None:
+            self._reset_at = None
+            return
+        self.n_pulses += 1
+        if self._reset_at is not None:
+            self.n_coalesced += 1
+        # the pulse lasts at least duration from the actual write
+        self._reset_at = max(self._reset_at or 0, t_written + duration)
+        self._reset_value = reset_value
+
+    def run(self):
+        _raise_priority()
+        while True:
+            with self._cond:
+                while not self._requests and not self._stopping:
+                    timeout = None
+                    if self._reset_at is not None:
+                        timeout = self._reset_at - core.getTime() - SPIN_MARGIN
+                        if timeout <= 0:
+                            break
+                    self._cond.wait(timeout)
+                requests, self._requests = self._requests, []
+                stopping = self._stopping
+
+            for request in requests:
+                self._output(*request)
+
+            if self._reset_at is not None and not requests:
+                while core.getTime() < self._reset_at and not self._requests:
+                    time.sleep(0)
+                if not self._requests:
+                    self._write(self._reset_value)
+                    self._reset_at = None
+
+            if stopping and not self._requests and self._reset_at is None:
+                break
+
+    def stop(self):
+        """Output the pending pulses, then stop the thread and close the backend."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self.is_alive():
+            self.join()
+        self.backend.close()
+        logging.exp(
+            f"{self.name}: {self.n_pulses} pulses, {self.n_coalesced} coalesced, "
+            f"max output latency {self.max_latency * 1000:.2f}ms"
+        )
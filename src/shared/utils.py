@@ -3,6 +3,7 @@ import time
 from psychopy import core, logging
 import os, glob
 from inspect import getframeinfo, stack
+from . import deadline as deadline_waiter
 
 def check_power_plugged():
     battery = psutil.sensors_battery()
@@ -11,18 +12,17 @@ def check_power_plugged():
     else:
         return True
 
-def wait_until(clock, deadline, hogCPUperiod=0.1, keyboard_accuracy=.0005):
+def _check_deadline(clock, deadline):
     if deadline < clock.getTime():
-        caller = getframeinfo(stack()[1][0])
+        caller = getframeinfo(stack()[2][0])
         logging.error(f'wait_until called after deadline: {deadline} < {clock.getTime()} {caller.filename}:{caller.lineno}')
-    sleep_until = deadline - hogCPUperiod
-    poll_windows()
-    current_time = clock.getTime()
-    while current_time < deadline:
-        if current_time < sleep_until:
-            time.sleep(keyboard_accuracy)
-        poll_windows()
-        current_time = clock.getTime()
+
+# hogCPUperiod: longest busy wait before the deadline, the spin margin is calibrated by the waiter
+def wait_until(clock, deadline, hogCPUperiod=0.1, keyboard_accuracy=.0005):
+    _check_deadline(clock, deadline)
+    for _ in deadline_waiter.get_waiter().wait(
+            clock, deadline, hogCPUperiod, keyboard_accuracy, poll_windows):
+        pass
 
 def poll_windows():
     for winWeakRef in core.openWindows:
@@ -32,19 +32,9 @@ def poll_windows():
             win.winHandle.dispatch_events()  # pump events
 
 def wait_until_yield(clock, deadline, hogCPUperiod=0.1, keyboard_accuracy=.0005):
-    if deadline < clock.getTime():
-        caller = getframeinfo(stack()[1][0])
-        logging.error(f'wait_until called after deadline: {deadline} < {clock.getTime()} {caller.filename}:{caller.lineno}')
-    sleep_until = deadline - hogCPUperiod
-    poll_windows()
-    current_time = clock.getTime()
-    while current_time < deadline:
-        if current_time < sleep_until:
-            time.sleep(keyboard_accuracy)
-            yield
-
-        poll_windows()
-        current_time = clock.getTime()
+    _check_deadline(clock, deadline)
+    yield from deadline_waiter.get_waiter().wait(
+        clock, deadline, hogCPUperiod, keyboard_accuracy, poll_windows)
 
 def get_subject_soundcheck_video(subject):
     setup_video_path = glob.glob(
@@ -0,0 +1,74 @@
+# text stimuli laid out ahead of time, for rapid serial presentation of words
+
+import time
+
+from psychopy import visual, logging
+
+# glyph atlases of pyglet fonts are RGBA textures
+ATLAS_BYTES_PER_PIXEL = 4
+
+
+def _atlas_bytes(stims):
+    # texture memory of the glyph atlases of the fonts used by the stimuli
+    atlases = {}
+    for stim in stims:
+        font = getattr(stim, "_font", None)
+        for texture in getattr(font, "textures", ()):
+            atlases[id(texture)] = texture.width * texture.height * ATLAS_BYTES_PER_PIXEL
+    return sum(atlases.values())
+
+
+class WordStimCache(object):
+    """One ready TextStim per unique word and style.
+
+    Setting the text of a TextStim lays it out again with pyglet, which is too
+    slow to be done between the flips of a rapid presentation. build() creates
+    and draws once all the words of a design at setup, presenting a word is
+    then only drawing its cached stimulus.
+    """
+
+    def __init__(self, win, **text_kwargs):
+        self.win = win
+        self._text_kwargs = text_kwargs
+        self._stims = {}  # (text, italic) -> TextStim
+        self.build_time = 0.
+        self.texture_bytes = 0
+
+    def _create(self, text, italic):
+        stim = visual.TextStim(
+            self.win, text=text, italic=italic, autoLog=False, **self._text_kwargs
+        )
+        # draw once to lay out the text and upload the glyphs
+        stim.draw(self.win)
+        self._stims[(text, italic)] = stim
+        return stim
+
+    def build(self, words):
+        """Pre-render words given as (text, italic) tuples."""
+        t_start = time.perf_counter()
+        n_words = len(self._stims)
+        for text, italic in words:
+            if (text, bool(italic)) not in self._stims:
+                self._create(text, bool(italic))
+        # remove the words drawn to the back buffer
+        self.win.clearBuffer()
+        self.build_time += time.perf_counter() - t_start
+
+        self.texture_bytes = _atlas_bytes(self._stims.values())
+        logging.exp(
+            f"word_cache: {len(self._stims) - n_words} words pre-rendered in "
+            f"{self.build_time:.2f}s, glyph atlases {self.texture_bytes / 1024 ** 2:.1f}MB"
+        )
+
+    def get(self, text, italic=False):
+        stim = self._stims.get((text, bool(italic)))
+        if stim is None:
+            logging.warning(f"word_cache: {text} not pre-rendered")
+            stim = self._create(text, bool(italic))
+        return stim
+
+    def __len__(self):
+        return len(self._stims)
+
+    def clear(self):
+        self._stims.clear()
@@ -8,7 +8,9 @@ import numpy as np
 from colorama import Fore
 import pandas as pd
 
-from ..shared import config, utils, eyetracking
+from ..shared import config, utils
+from ..shared.fixation import fixation_dot
+from ..shared.clip_pool import ClipPool
 
 FADE_TO_GREY_DURATION = 2
 SCALING_EMOTION_VIDEOS = 900 #pix
@@ -55,25 +57,16 @@ class EmotionVideos(Task):
             size=(40,40),
             units='pix',
         )"""
-        self.fixation = eyetracking.fixation_dot(exp_win)
-
-        #Preload all videos
-        self._stimuli = []
-        for idx, trial in enumerate(self.design.Gif):
-            self.n_trial = idx
-            video = visual.MovieStim(
-                exp_win, os.path.join(self.videos_path, trial),
-                units = 'pix',
-            )
-            width_video, height_video = video.videoSize
-            #Rescale videos if needed
-            if width_video >= height_video:
-                scaling = SCALING_EMOTION_VIDEOS / width_video
-            else:
-                scaling = SCALING_EMOTION_VIDEOS / height_video
-            if scaling < SCALING_EMOTION_VIDEOS:
-                video.size = (width_video * scaling, height_video * scaling)
-            self._stimuli.append(video)
+        self.fixation = fixation_dot(exp_win)
+
+        #Open the first videos, next ones are opened during fixations
+        self._clips = ClipPool(
+            exp_win,
+            [os.path.join(self.videos_path, trial) for trial in self.design.Gif],
+            on_open=self._scale_video,
+            units = 'pix',
+        )
+        self._clips.open_ahead(0)
 
         self.trials = data.TrialHandler(self.path_design, 1, method="sequential")
         self.duration = len(self.design)
@@ -81,6 +74,16 @@ class EmotionVideos(Task):
         super()._setup(exp_win)
 
 
+    def _scale_video(self, video):
+        width_video, height_video = video.videoSize
+        #Rescale videos if needed
+        if width_video >= height_video:
+            scaling = SCALING_EMOTION_VIDEOS / width_video
+        else:
+            scaling = SCALING_EMOTION_VIDEOS / height_video
+        if scaling < SCALING_EMOTION_VIDEOS:
+            video.size = (width_video * scaling, height_video * scaling)
+
     def _instructions(self, exp_win, ctl_win):
         screen_text = visual.TextStim(
             exp_win,
@@ -107,7 +110,7 @@ class EmotionVideos(Task):
         yield True
         yield True
 
-        for trial_n, (trial, stimuli) in enumerate(zip(self.trials, self._stimuli)):
+        for trial_n, trial in enumerate(self.trials):
             self.n_trial = trial_n
 
             exp_win.logOnFlip(
@@ -129,6 +132,10 @@ class EmotionVideos(Task):
             yield True #flip
             trial['onset_fixation_flip'] = self._exp_win_last_flip_time - self._exp_win_first_flip_time
 
+            #Open this video and the next ones while the fixation is shown
+            self._clips.open_ahead(trial_n)
+            stimuli = self._clips.get(trial_n)
+
             #Wait onset for videos
             utils.wait_until(self.task_timer, trial["onset"] - 1 / config.FRAME_RATE)
             if stimuli.pts != 0:
@@ -145,7 +152,7 @@ class EmotionVideos(Task):
             # clear screen and back buffer
             yield True
             yield True
-            stimuli._player.unload() #stop+cleanup
+            self._clips.close(trial_n) #stop+cleanup off the render thread
 
         utils.wait_until(self.task_timer, self.target_duration)
         self._task_completed = True
@@ -153,6 +160,8 @@ class EmotionVideos(Task):
 
     def _restart(self):
         self.trials = data.TrialHandler(self.path_design, 1, method="sequential")
+        self._clips.reset()
+        self._clips.open_ahead(0)
 
     def _stop(self, exp_win, ctl_win):
         for frameN in range(config.FRAME_RATE * FADE_TO_GREY_DURATION):
@@ -166,4 +175,5 @@ class EmotionVideos(Task):
         self.trials.saveAsWideText(self._generate_unique_filename("events", "tsv"))
 
     def unload(self):
-        del self._stimuli
+        self._clips.clear()
+        del self._clips
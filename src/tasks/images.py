@@ -3,6 +3,10 @@ from psychopy import visual, core, data, logging
 from .task_base import Task
 
 from ..shared import config
+from ..shared.image_cache import ImagePrefetcher
+
+# number of upcoming images decoded ahead of the current trial
+PREFETCH_TRIALS = 3
 
 STIMULI_DURATION = 3
 BASELINE_BEGIN = 5
@@ -26,6 +30,14 @@ You will see pictures of scenes and objects."""
         else:
             raise ValueError("Cannot find the listed images in %s " % images_path)
 
+    def _setup(self, exp_win):
+        super()._setup(exp_win)
+        self.images_paths = [
+            os.path.join(self.images_path, trial["image_path"]) for trial in self.image_names
+        ]
+        # created once, restarts of the task reuse its threads and decoded images
+        self._images = ImagePrefetcher()
+
     def _instructions(self, exp_win, ctl_win):
         screen_text = visual.TextStim(
             exp_win,
@@ -44,15 +56,17 @@ You will see pictures of scenes and objects."""
     def _run(self, exp_win, ctl_win):
 
         self.trials = data.TrialHandler(self.image_names, 1, method="sequential")
+        self._images.prefetch(self.images_paths[:PREFETCH_TRIALS])
         img = visual.ImageStim(exp_win, size=(1, 1), units="height")
         exp_win.logOnFlip(
             level=logging.EXP, msg="image: task starting at %f" % time.time()
         )
         for frameN in range(config.FRAME_RATE * BASELINE_BEGIN):
             yield ()
-        for trial in self.trials:
+        for trial_idx, trial in enumerate(self.trials):
             image_path = os.path.join(self.images_path, trial["image_path"])
-            img.image = image_path
+            img.image = self._images.get(image_path)
+            self._images.prefetch(self.images_paths[trial_idx + 1:trial_idx + 1 + PREFETCH_TRIALS])
             exp_win.logOnFlip(level=logging.EXP, msg="image: display %s" % image_path)
             trial["onset"] = self.task_timer.getTime()
             for frameN in range(config.FRAME_RATE * STIMULI_DURATION):
@@ -72,6 +86,10 @@ You will see pictures of scenes and objects."""
         self.trials.saveAsWideText(self._generate_unique_filename("events", "tsv"))
         return False
 
+    def unload(self):
+        if hasattr(self, "_images"):
+            self._images.close()
+
 
 class BOLD5000Images(Images):
     pass
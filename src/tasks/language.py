@@ -5,7 +5,9 @@ from .task_base import Task
 from colorama import Fore
 
 from ..shared import config, utils
-from ..shared.eyetracking import fixation_dot
+from ..shared.fixation import fixation_dot
+from ..shared.word_cache import WordStimCache
+from ..shared.trial_table import TrialTable
 
 TR = 1.49
 STIMULI_DURATION = 4
@@ -412,43 +414,49 @@ class Reading(Task):
 
     def _setup(self, exp_win):
 
-        self.txt_stim = visual.TextStim(
+        # all words are laid out now, not between flips
+        self.word_stims = WordStimCache(
             exp_win,
-            text="+",
             font=self.txt_font,
             height=self.txt_size,
             units='pix',
             alignText="center",
             color=self.txt_color,
         )
+        self.word_stims.build(
+            zip(self.words_list["word"], self.words_list["format"] == "italic"))
+        self.trials = TrialTable(
+            self.words_list,
+            {"onset_flip": float, "offset_flip": float, "duration_flip": float})
         self._progress_bar_refresh_rate = 1 # 1 flip / trial
 
     def _run(self, exp_win, ctl_win):
+        words = self.trials["word"]
+        formats = self.trials["format"]
+        onsets = self.trials["onset"]
+        onset_flip = self.trials["onset_flip"]
+        offset_flip = self.trials["offset_flip"]
+        duration_flip = self.trials["duration_flip"]
 
         # Display each word
-        for trial_n, trial in self.words_list.iterrows():
-            self.txt_stim.text = trial["word"]
-            self.txt_stim._pygletTextObj.set_style('italic', trial["format"] == "italic")
-            self.txt_stim.draw(exp_win)
-            self.progress_bar.set_description(f"Trial {trial_n}:: {trial['word']} {trial['format']}")
+        for trial_n in range(len(self.trials)):
+            self.word_stims.get(words[trial_n], formats[trial_n] == "italic").draw(exp_win)
+            self.progress_bar.set_description(f"Trial {trial_n}:: {words[trial_n]} {formats[trial_n]}")
             utils.wait_until(
                 self.task_timer,
-                trial["onset"] - 1 / config.FRAME_RATE,
+                onsets[trial_n] - 1 / config.FRAME_RATE,
                 hogCPUperiod=0.2)
             yield True  # flip
-            self.words_list.at[trial_n, "onset_flip"] = (
+            onset_flip[trial_n] = (
                 self._exp_win_last_flip_time - self._exp_win_first_flip_time
             )
             if trial_n > 0:
-                self.words_list.at[trial_n - 1, "offset_flip"] = self.words_list.at[trial_n, "onset_flip"]
-                self.words_list.at[trial_n -1, "duration_flip"] = (
-                    self.words_list.at[trial_n - 1, "offset_flip"]
-                    - self.words_list.at[trial_n - 1, "onset_flip"]
-                )
+                offset_flip[trial_n - 1] = onset_flip[trial_n]
+                duration_flip[trial_n - 1] = offset_flip[trial_n - 1] - onset_flip[trial_n - 1]
         # wait for last event duration
         utils.wait_until(
             self.task_timer,
-            trial["onset"]+trial["duration"] - 1 / config.FRAME_RATE
+            onsets[-1] + self.trials["duration"][-1] - 1 / config.FRAME_RATE
         )
         yield
 
@@ -457,16 +465,16 @@ class Reading(Task):
         for _ in range(2):
             yield True
 
-    def _save(self):
-        #self.words_list.saveAsWideText(self._generate_unique_filename("events", "tsv")
-        self.words_list.to_csv(
-            self._generate_unique_filename("events", "tsv"),
-            sep = '\t',
-            index = False,
+    def _restart(self):
+        self.trials.reset()
 
-        )
+    def _save(self):
+        self.trials.save(self._generate_unique_filename("events", "tsv"))
         return False
 
+    def unload(self):
+        self.word_stims.clear()
+
 class Listening(Task):
 
     DEFAULT_INSTRUCTION = """You are about to listen to audio stimuli"""
@@ -612,15 +620,18 @@ class ReadingBlocks(Task):
     def _setup(self, exp_win):
         self.trials = data.TrialHandler(self.design, 1, method="sequential")
         self.fixation_dot = fixation_dot(exp_win)
-        self.txt_stim = visual.TextStim(
+        # all words are laid out now, not between flips
+        self.word_stims = WordStimCache(
             exp_win,
-            text="+",
             font=self.txt_font,
             height=self.txt_size,
             units='pix',
             alignText="center",
             color=self.txt_color,
         )
+        self.word_stims.build(
+            [(':', False)] +
+            [(trial['word'], False) for trial in self.design if trial['trial_type'] not in ['fix', 'press']])
 
     def _instructions(self, exp_win, ctl_win):
         screen_text = visual.TextStim(
@@ -646,10 +657,9 @@ class ReadingBlocks(Task):
             else:
                 if trial['trial_type'] == 'press':
                     last_press_trial = trial
-                    self.txt_stim.text = ':'
+                    self.word_stims.get(':').draw(exp_win)
                 else:
-                    self.txt_stim.text = trial['word']
-                self.txt_stim.draw(exp_win)
+                    self.word_stims.get(trial['word']).draw(exp_win)
             if trial_n > 0: #
                 utils.wait_until(self.task_timer, trial['onset'] - 1/config.FRAME_RATE)
             else: # force assignt to none, otherwise future trial will just dismiss the added fields
@@ -675,3 +685,6 @@ class ReadingBlocks(Task):
     def _save(self):
         self.trials.saveAsWideText(self._generate_unique_filename("events", "tsv"))
         return False
+
+    def unload(self):
+        self.word_stims.clear()
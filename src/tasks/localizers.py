@@ -7,7 +7,8 @@ from pandas import DataFrame, read_csv
 from .task_base import Task
 import json
 
-from ..shared import config, utils
+from ..shared import config, utils, schedule
+from ..shared.image_cache import ImagePrefetcher
 
 STIMULI_DURATION = 4
 BASELINE_BEGIN = 5
@@ -129,8 +130,73 @@ class FLoc(Task):
         self.miniblock_categories = randomize_carefully(standard_categories, n_blocks_per_category)
         np.random.shuffle(self.task_miniblocks)
 
+        # flips of the block starts, and of the onset and offset of each image
+        block_onsets = (
+            self.constants['COUNTDOWN_DURATION'] +
+            np.arange(len(self.miniblock_categories)) * np.sum(self.constants['TRIAL_DURATION']))
+        image_onsets = block_onsets[:, np.newaxis] + np.cumsum(self.constants['TRIAL_DURATION'])
+        interval = schedule.refresh_interval(exp_win)
+        self._block_schedule = schedule.FlipSchedule(block_onsets, interval)
+        self._image_schedule = schedule.FlipSchedule(
+            np.stack([image_onsets, image_onsets + self.constants['IMAGE_DURATION']], axis=-1),
+            interval)
+        self._block_schedule.validate(f"{self.name} blocks")
+        self._image_schedule.validate(f"{self.name} images")
+
         self.duration = self.constants['TOTAL_DURATION']
         self._progress_bar_refresh_rate = 2
+        self._images = ImagePrefetcher()
+
+    def _miniblocks(self):
+        # stimuli and target of each miniblock, drawn in order as targets depend on the previous one
+        nonbaseline_block_counter = 0
+        target_idx = None
+        # since made into a list, estimate average trial duration
+        mean_trial_duration = np.sum(self.constants['TRIAL_DURATION'])/self.constants['N_STIMULI_PER_BLOCK']
+        for j_miniblock, category in enumerate(self.miniblock_categories):
+            if category == 'baseline':
+                yield None, None
+                continue
+            # Block of stimuli
+            miniblock_stimuli = list(np.random.choice(
+                self.stimuli[category], size=self.constants['N_STIMULI_PER_BLOCK'], replace=False))
+            if self.task_miniblocks[nonbaseline_block_counter] == 1:
+                # Check for last block's target to make sure that two targets don't
+                # occur within the same response exp_win
+                if (j_miniblock > 0) and (target_idx is not None):
+                    #last_target_onset = (((self.constants['N_STIMULI_PER_BLOCK'] + 1) - target_idx) *
+                    #                     self.constants['TRIAL_DURATION'] * -1)
+
+                    last_target_onset = (((self.constants['N_STIMULI_PER_BLOCK'] + 1) - target_idx) *
+                                         mean_trial_duration * -1)
+                    last_target_rw_offset = last_target_onset + self.constants['RESPONSE_WINDOW']
+                    #first_viable_trial = int(np.ceil(last_target_rw_offset /
+                    #                                 self.constants['TRIAL_DURATION']))
+                    first_viable_trial = int(np.ceil(last_target_rw_offset / mean_trial_duration))
+                    first_viable_trial = np.maximum(0, first_viable_trial)
+                    first_viable_trial += 1  # just to give it a one-trial buffer
+                else:
+                    first_viable_trial = 0
+
+                # Adjust stimuli based on task
+                if self.task == 'Oddball':
+                    # target is scrambled image
+                    target_idx = np.random.randint(first_viable_trial, len(miniblock_stimuli))
+                    miniblock_stimuli[target_idx] = np.random.choice(self.stimuli['scrambled'])
+                elif self.task == 'OneBack':
+                    # target is second stim of same kind
+                    first_viable_trial = np.maximum(first_viable_trial, 1)
+                    target_idx = np.random.randint(first_viable_trial, len(miniblock_stimuli))
+                    miniblock_stimuli[target_idx] = miniblock_stimuli[target_idx - 1]
+                elif self.task == 'TwoBack':
+                    # target is second stim of same kind
+                    first_viable_trial = np.maximum(first_viable_trial, 2)
+                    target_idx = np.random.randint(first_viable_trial, len(miniblock_stimuli))
+                    miniblock_stimuli[target_idx] = miniblock_stimuli[target_idx - 2]
+            else:
+                target_idx = None
+            nonbaseline_block_counter += 1
+            yield miniblock_stimuli, target_idx
 
     def _run(self, exp_win, ctl_win):
         exp_win.logOnFlip(
@@ -138,10 +204,15 @@ class FLoc(Task):
         )
         self.fixation.draw(exp_win)
         yield True
+
+        # the images of a miniblock are decoded while the previous one is shown
+        miniblocks = self._miniblocks()
+        next_miniblock = next(miniblocks, (None, None))
+        if next_miniblock[0]:
+            self._images.prefetch(next_miniblock[0])
         utils.wait_until(self.task_timer, self.constants['COUNTDOWN_DURATION'])
 
         run_responses, run_response_times = [], []
-        nonbaseline_block_counter = 0
         #block_duration = self.constants['N_STIMULI_PER_BLOCK'] * self.constants['TRIAL_DURATION']
         block_duration = np.sum(self.constants['TRIAL_DURATION'])
 
@@ -149,17 +220,16 @@ class FLoc(Task):
         last_target_idx = -1
         last_target_event_onset = np.nan
 
-        # since made into a list, estimate average trial duration
-        mean_trial_duration = np.sum(self.constants['TRIAL_DURATION'])/self.constants['N_STIMULI_PER_BLOCK']
-
         for j_miniblock, category in enumerate(self.miniblock_categories):
             #miniblock_clock.reset()
+            miniblock_stimuli, target_idx = next_miniblock
+            next_miniblock = next(miniblocks, (None, None))
+            if next_miniblock[0]:
+                self._images.prefetch(next_miniblock[0])
 
             if category == 'baseline':
                 self.fixation.draw(exp_win)
-                utils.wait_until(
-                    self.task_timer,
-                    self.constants['COUNTDOWN_DURATION'] + j_miniblock * block_duration)
+                utils.wait_until(self.task_timer, self._block_schedule.deadlines[j_miniblock])
                 yield True
                 # todo response + log
 
@@ -172,57 +242,13 @@ class FLoc(Task):
                     'category': category,
                 })
             else:
-                # Block of stimuli
-                miniblock_stimuli = list(np.random.choice(
-                    self.stimuli[category], size=self.constants['N_STIMULI_PER_BLOCK'], replace=False))
-                if self.task_miniblocks[nonbaseline_block_counter] == 1:
-                    # Check for last block's target to make sure that two targets don't
-                    # occur within the same response exp_win
-                    if (j_miniblock > 0) and (target_idx is not None):
-                        #last_target_onset = (((self.constants['N_STIMULI_PER_BLOCK'] + 1) - target_idx) *
-                        #                     self.constants['TRIAL_DURATION'] * -1)
-
-                        last_target_onset = (((self.constants['N_STIMULI_PER_BLOCK'] + 1) - target_idx) *
-                                             mean_trial_duration * -1)
-                        last_target_rw_offset = last_target_onset + self.constants['RESPONSE_WINDOW']
-                        #first_viable_trial = int(np.ceil(last_target_rw_offset /
-                        #                                 self.constants['TRIAL_DURATION']))
-                        first_viable_trial = int(np.ceil(last_target_rw_offset / mean_trial_duration))
-                        first_viable_trial = np.maximum(0, first_viable_trial)
-                        first_viable_trial += 1  # just to give it a one-trial buffer
-                    else:
-                        first_viable_trial = 0
-
-                    # Adjust stimuli based on task
-                    if self.task == 'Oddball':
-                        # target is scrambled image
-                        target_idx = np.random.randint(first_viable_trial, len(miniblock_stimuli))
-                        miniblock_stimuli[target_idx] = np.random.choice(self.stimuli['scrambled'])
-                    elif self.task == 'OneBack':
-                        # target is second stim of same kind
-                        first_viable_trial = np.maximum(first_viable_trial, 1)
-                        target_idx = np.random.randint(first_viable_trial, len(miniblock_stimuli))
-                        miniblock_stimuli[target_idx] = miniblock_stimuli[target_idx - 1]
-                    elif self.task == 'TwoBack':
-                        # target is second stim of same kind
-                        first_viable_trial = np.maximum(first_viable_trial, 2)
-                        target_idx = np.random.randint(first_viable_trial, len(miniblock_stimuli))
-                        miniblock_stimuli[target_idx] = miniblock_stimuli[target_idx - 2]
-                    last_target_idx = target_idx
-                else:
-                    target_idx = None
-
                 for k_stim, stim_file in enumerate(miniblock_stimuli):
 
-                    self.stim_image.image = stim_file
+                    self.stim_image.image = self._images.get(stim_file)
                     self.stim_image.draw(exp_win)
                     self.fixation.draw(exp_win)
                     utils.wait_until(
-                        self.task_timer,
-                        self.constants['COUNTDOWN_DURATION'] + \
-                        j_miniblock * block_duration + \
-                        #k_stim * self.constants["TRIAL_DURATION"])
-                        np.sum(self.constants["TRIAL_DURATION"][:k_stim + 1]))
+                        self.task_timer, self._image_schedule.deadlines[j_miniblock, k_stim, 0])
                     yield True
 
                     is_target = target_idx == k_stim
@@ -230,12 +256,7 @@ class FLoc(Task):
 
                     self.fixation.draw(exp_win)
                     utils.wait_until(
-                        self.task_timer,
-                        self.constants['COUNTDOWN_DURATION'] + \
-                        j_miniblock * block_duration + \
-                        #k_stim * self.constants["TRIAL_DURATION"] + \
-                        np.sum(self.constants["TRIAL_DURATION"][:k_stim + 1]) + \
-                        self.constants["IMAGE_DURATION"])
+                        self.task_timer, self._image_schedule.deadlines[j_miniblock, k_stim, 1])
                     yield True
 
                     offset = self._exp_win_last_flip_time - self._exp_win_first_flip_time
@@ -264,7 +285,6 @@ class FLoc(Task):
                             'task': self.task,
                         })
 
-                nonbaseline_block_counter += 1
         utils.wait_until(
             self.task_timer,
             self.constants['COUNTDOWN_DURATION'] + \
@@ -277,6 +297,9 @@ class FLoc(Task):
         for _ in range(2):
             yield True
 
+    def unload(self):
+        self._images.close()
+
 
 def randomize_carefully(elems, n_repeat=2):
     """
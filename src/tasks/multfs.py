@@ -8,7 +8,8 @@ from .task_base import Task
 from .task_base import Fixation
 #psychopy.useVersion('latest')
 
-from ..shared import config, utils
+from ..shared import config, utils, schedule
+from ..shared.image_cache import ImagePrefetcher
 
 initial_wait = 6
 final_wait = 9
@@ -57,6 +58,14 @@ class multfs_base(Task):
         self.empty_text = visual.TextStim(exp_win, text="", alignText = "center", color = "white", height = 0.1)
         self.no_response_marker = visual.Circle(exp_win, 20, units='pix', fillColor=(255,0,0), fillColorSpace='rgb255')
 
+        # the few stimuli images are all decoded before the run starts
+        self._images = ImagePrefetcher()
+        self._images.prefetch(sorted(set(
+            _image_path(item[key])
+            for item in self.item_list for key in item
+            if key.startswith('ref') and key[3:].isdigit() and item[key] is not None
+        )))
+
         total_duration = (
             initial_wait +
             (self.n_blocks * self.n_trials) *
@@ -65,6 +74,23 @@ class multfs_base(Task):
             )
         print(f"TOTAL DURATION: {total_duration}")
 
+        # stimuli onsets of each block, trial and position in the sequence
+        trial_duration = self.seq_len * STIMULI_DURATION + sum(self.trial_isis)
+        trial_isis = np.asarray(self.trial_isis)
+        stim_starts = np.arange(self.seq_len) * STIMULI_DURATION + np.cumsum(trial_isis) - trial_isis
+        onsets = (
+            initial_wait +
+            np.arange(self.n_blocks * self.n_trials).reshape(self.n_blocks, self.n_trials, 1) * trial_duration +
+            stim_starts)
+        self._onsets = onsets
+        # flips of the onset and offset of each stimulus
+        self._schedule = schedule.FlipSchedule(
+            np.stack([onsets, onsets + STIMULI_DURATION], axis=-1),
+            schedule.refresh_interval(exp_win))
+        self._schedule.validate(self.name)
+        # collect responses until almost the end of each ISI
+        self._response_deadlines = onsets + STIMULI_DURATION + trial_isis - 10./config.FRAME_RATE
+
         super()._setup(exp_win)
 
     def _instructions(self, exp_win, ctl_win):
@@ -186,6 +212,9 @@ class multfs_base(Task):
         )
         yield True
 
+    def unload(self):
+        self._images.close()
+
     def _save(self):
         if hasattr(self, 'trials'):
             self.trials.saveAsWideText(self._generate_unique_filename("events", "tsv"))
@@ -204,11 +233,6 @@ class multfs_base(Task):
         img = visual.ImageStim(exp_win, size=STIMULI_SIZE, units="norm")
 
         for block in range(n_blocks):
-            onset = (
-                initial_wait +
-                #(block) * config.INSTRUCTION_DURATION +
-                (block * self.n_trials) * ( self.seq_len * STIMULI_DURATION + sum(self.trial_isis))
-                )
             #yield from self._block_intro(exp_win, ctl_win, onset, self.n_trials)
 
             trial_idx = 0
@@ -218,15 +242,10 @@ class multfs_base(Task):
 
                 for n_stim in range(self.seq_len):
 
-                    onset = (
-                        initial_wait +
-                        #(block + 1) * config.INSTRUCTION_DURATION +
-                        (block * self.n_trials + (trial_idx-1)) *
-                        ( self.seq_len * STIMULI_DURATION + sum(self.trial_isis)) +
-                        n_stim*STIMULI_DURATION + sum(self.trial_isis[:n_stim])
-                        )
+                    onset = self._onsets[block, trial_idx-1, n_stim]
+                    onset_deadline, offset_deadline = self._schedule.deadlines[block, trial_idx-1, n_stim]
 
-                    img.image = IMAGES_FOLDER + "/" + str(trial["ref%s" % str(n_stim+1)]) + "/image.png"
+                    img.image = self._images.get(_image_path(trial["ref%s" % str(n_stim+1)]))
                     if not 'interdms' in self.name:
                         img.pos = triplet_id_to_pos[trial[f"loc{n_stim+1}"]]
                     else:
@@ -241,14 +260,14 @@ class multfs_base(Task):
                     if n_stim in self.no_response_frames:
                         self.no_response_marker.draw(exp_win)
 
-                    utils.wait_until(self.task_timer, onset - 1/config.FRAME_RATE)
+                    utils.wait_until(self.task_timer, onset_deadline)
                     yield True
                     self.trials.addData(
                         "stimulus_%d_onset" % n_stim,
                         self._exp_win_last_flip_time - self._exp_win_first_flip_time)
                     utils.wait_until(
                         self.task_timer,
-                        onset + STIMULI_DURATION - 1/config.FRAME_RATE,
+                        offset_deadline,
                         keyboard_accuracy=.0001)
                     # draw fixation for ITI
                     if n_stim == self.seq_len-1:
@@ -261,7 +280,7 @@ class multfs_base(Task):
                     # wait until almost the end of the ISI to collect responses.
                     utils.wait_until(
                         self.task_timer,
-                        onset + STIMULI_DURATION + self.trial_isis[n_stim] - 10./config.FRAME_RATE,
+                        self._response_deadlines[block, trial_idx-1, n_stim],
                         keyboard_accuracy=.0001)
 
                     multfs_answer_keys = psychopy.event.getKeys(
@@ -293,6 +312,10 @@ class multfs_base(Task):
         yield True
 
 
+def _image_path(ref):
+    return IMAGES_FOLDER + "/" + str(ref) + "/image.png"
+
+
 class multfs_dms(multfs_base):
 
     def __init__(self, items_list, feature = "loc", session = None, **kwargs):
@@ -6,7 +6,7 @@ from psychopy import visual, sound, event, core, logging
 
 from .task_base import Task
 from ..shared import config, utils
-from ..shared.eyetracking import fixation_dot
+from ..shared.fixation import fixation_dot
 
 #task : 1 run = 1 playlist = around 10 audio tracks
 #repeat for n songs in subXX_runXX.csv :
@@ -5,7 +5,7 @@ from .task_base import Task
 from colorama import Fore
 
 from ..shared import config, utils
-from ..shared.eyetracking import fixation_dot
+from ..shared.fixation import fixation_dot
 
 INSTRUCTION_DURATION = 4
 
@@ -1,4 +1,4 @@
-import os, sys, time, random
+import os, sys, time, random, mmap
 from psychopy import visual, core, data, logging, event
 from .task_base import Task
 import numpy as np
@@ -11,6 +11,42 @@ from ..shared import config, utils
 def generate_wedge():
     pass
 
+
+def _frames_cache(npz_file, key):
+    """Memory-map the frames stored in npz_file[key], frames first.
+
+    npz stacks are (height, width, [channels,] frames) and compressed: they are
+    converted once to an uncompressed uint8 .npy next to the npz, with frames as
+    the first axis so that each frame is contiguous on disk.
+    """
+    cache_file = os.path.splitext(npz_file)[0] + f"_{key}_frames.npy"
+    if not os.path.exists(cache_file) or \
+            os.path.getmtime(cache_file) < os.path.getmtime(npz_file):
+        logging.exp(f"building frames cache {cache_file}")
+        frames = np.load(npz_file)[key]
+        cache = np.lib.format.open_memmap(
+            cache_file + ".tmp.npy",
+            mode="w+",
+            dtype=frames.dtype,
+            shape=(frames.shape[-1],) + frames.shape[:-1])
+        for fi in range(frames.shape[-1]):
+            cache[fi] = frames[..., fi]
+        cache.flush()
+        del cache, frames
+        os.replace(cache_file + ".tmp.npy", cache_file)
+    return np.load(cache_file, mmap_mode="r")
+
+
+def _advise_frames(frames, start, stop, advice):
+    # hint the kernel about the frames about to be (or no longer) used
+    if not hasattr(mmap, "MADV_WILLNEED") or getattr(frames, "_mmap", None) is None:
+        return
+    frame_nbytes = frames[0].nbytes
+    first = frames.offset + start * frame_nbytes
+    first -= first % mmap.PAGESIZE
+    last = frames.offset + stop * frame_nbytes
+    frames._mmap.madvise(advice, first, last - first)
+
 class Retinotopy(Task):
 
     DEFAULT_INSTRUCTION = """You will see a dot in the center of the screen.
@@ -41,6 +77,35 @@ class Retinotopy(Task):
 
 
 
+    def _prepare(self):
+        self._grid_mask = np.load("data/retinotopy/grid.npz")['grid']/128.-1
+
+        # uint8 frames, converted to float one at a time when shown
+        self._images = _frames_cache(self._images_file, 'images')
+
+        if self.condition in ['RETCW', 'RETCCW', 'RETWEDGES']:
+            aperture_file = 'apertures_wedge_newtr.npz'
+        elif self.condition in ['RETEXP', 'RETCON', 'RETRINGS']:
+            aperture_file = '/apertures_ring.npz'
+        elif self.condition == 'RETBAR':
+            self.ncycles = 8
+            aperture_file =  'apertures_bars.npz'
+        self._apertures = _frames_cache(f"data/retinotopy/{aperture_file}", 'apertures')
+
+        self.cycle_length = 21*config.TR # a bit less than 32s for TR=1.49
+        self.initial_wait = 16 # if self.condition == 'RETBAR' else 22
+        self.middle_blank = 12 if self.condition in ['RETRINGS', 'RETWEDGES', 'RETBAR'] else 0
+        self.duration = (
+            32 * self.ncycles * (1 + (self.condition in ['RETRINGS', 'RETWEDGES']))
+            + self.initial_wait * 2
+            + self.middle_blank)
+
+        # draw random order with different successive stimuli
+        self._images_random = np.random.randint(0, self._images.shape[0], size=(8*32*self._images_fps)) #max nframe in CW conditions
+        while any(np.ediff1d(self._images_random, to_begin=[-1])==0):
+            self._images_random[np.ediff1d(self._images_random, to_begin=[-1])==0] += 1
+            self._images_random[self._images_random==self._images.shape[0]] = 0
+
     def _setup(self, exp_win):
         self.fixation_dot = visual.Circle(
             exp_win,
@@ -49,13 +114,11 @@ class Retinotopy(Task):
             units='deg',
         )
 
-
-        grid = np.load("data/retinotopy/grid.npz")['grid']
         self.grid = visual.ImageStim(
             exp_win,
             name='grid',
             image=np.ones((1,1,3)),
-            mask=grid/128.-1,
+            mask=self._grid_mask,
             size=10,
             units='deg'
         )
@@ -67,31 +130,6 @@ class Retinotopy(Task):
             units='deg',
             flipVert=True)
 
-        self._images = np.load(self._images_file)['images'].astype(np.float32)/255.
-
-        if self.condition in ['RETCW', 'RETCCW', 'RETWEDGES']:
-            aperture_file = 'apertures_wedge_newtr.npz'
-        elif self.condition in ['RETEXP', 'RETCON', 'RETRINGS']:
-            aperture_file = '/apertures_ring.npz'
-        elif self.condition == 'RETBAR':
-            self.ncycles = 8
-            aperture_file =  'apertures_bars.npz'
-        self._apertures = np.load(f"data/retinotopy/{aperture_file}")['apertures'].astype(np.float32)/128.-1
-
-        self.cycle_length = 21*config.TR # a bit less than 32s for TR=1.49
-        self.initial_wait = 16 # if self.condition == 'RETBAR' else 22
-        self.middle_blank = 12 if self.condition in ['RETRINGS', 'RETWEDGES', 'RETBAR'] else 0
-        self.duration = (
-            32 * self.ncycles * (1 + (self.condition in ['RETRINGS', 'RETWEDGES']))
-            + self.initial_wait * 2
-            + self.middle_blank)
-
-        # draw random order with different successive stimuli
-        self._images_random = np.random.randint(0, self._images.shape[-1], size=(8*32*self._images_fps)) #max nframe in CW conditions
-        while any(np.ediff1d(self._images_random, to_begin=[-1])==0):
-            self._images_random[np.ediff1d(self._images_random, to_begin=[-1])==0] += 1
-            self._images_random[self._images_random==self._images.shape[-1]] = 0
-
         self._progress_bar_refresh_rate = False
 
         self.events = pandas.DataFrame()
@@ -194,11 +232,27 @@ class Retinotopy(Task):
     def reset_img(self):
         self.img.image = None
 
+    def _image(self, image_idx):
+        return np.multiply(self._images[image_idx], 1/255., dtype=np.float32)
+
+    def _aperture(self, frame):
+        aperture = np.multiply(self._apertures[frame], 1/128., dtype=np.float32)
+        aperture -= 1
+        return aperture
+
+    def _load_cycle(self, start, stop):
+        # only the apertures of the upcoming cycle need to be resident
+        if self._cycle_frames is not None:
+            _advise_frames(self._apertures, *self._cycle_frames, mmap.MADV_DONTNEED)
+        _advise_frames(self._apertures, start, stop, mmap.MADV_WILLNEED)
+        self._cycle_frames = (start, stop)
+
     def _run_condition(self, exp_win, ctl_win):
 
         frame_duration = 1/15.
 
         self._cycle_start = None
+        self._cycle_frames = None
         self.reset_img()
 
         yield True
@@ -213,6 +267,7 @@ class Retinotopy(Task):
             conds = np.asarray([0,1,0,1,2,3,2,3])
             for ci, start_idx in enumerate(conds*28*15):
                 order = 1-(ci%4>1)*2
+                self._load_cycle(start_idx, start_idx+28*15)
                 exp_win.timeOnFlip(self, '_cycle_start')
                 for fi, frame in enumerate(range(28*15)[::order]):
                     flip_time = (self.initial_wait + (ci>3) * self.middle_blank +
@@ -229,8 +284,8 @@ class Retinotopy(Task):
                     #flipHoriz = 1 - 2*(ci in [2])
                     if fi%(15//self._images_fps) == 0:
                         image_idx = self._images_random[ci*32*self._images_fps+fi//(15//self._images_fps)]
-                        self.img.image = self._images[..., image_idx]
-                    self.img.mask = self._apertures[..., start_idx+frame]
+                        self.img.image = self._image(image_idx)
+                    self.img.mask = self._aperture(start_idx+frame)
 
                     exp_win.callOnFlip(
                         self._log_event,
@@ -257,6 +312,7 @@ class Retinotopy(Task):
                 display_length = (self.cycle_length
                     if self.condition in ['RETCW', 'RETCCW', 'RETWEDGES']
                     else 28) # shorten next loop, adds 4s blank
+                self._load_cycle(0, int(display_length*15))
                 exp_win.timeOnFlip(self, '_cycle_start')
                 for fi, frame in enumerate(range(int(display_length*15))[::order]): # 32/28 sec at 15Hz
                     flip_time = (self.initial_wait +
@@ -271,9 +327,9 @@ class Retinotopy(Task):
 
                     if fi%(15//self._images_fps) == 0:
                         image_idx = self._images_random[ci*32*self._images_fps+fi//(15//self._images_fps)]
-                        self.img.image = self._images[..., image_idx]
+                        self.img.image = self._image(image_idx)
 
-                    self.img.mask = self._apertures[..., frame]
+                    self.img.mask = self._aperture(frame)
 
                     exp_win.callOnFlip(
                         self._log_event,
@@ -303,4 +359,4 @@ class Retinotopy(Task):
 
     def unload(self):
         del self._apertures, self._images
-        del self.img, self._images_random, self.fixation_dot
+        del self.img, self._images_random, self.fixation_dot, self._grid_mask
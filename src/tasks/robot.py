@@ -1,6 +1,8 @@
 # from concurrent.futures import thread
 import struct
 import threading
+import queue
+import codecs
 import time
 from typing import Optional
 import copy
@@ -15,9 +17,10 @@ import os
 from pylsl import StreamInlet, resolve_byprop, StreamInfo, StreamOutlet
 from pylsl import local_clock as lsl_local_clock
 from psychopy import visual, core, logging, event
-from ast import literal_eval
 from .task_base import Task
 from ..shared import config
+from ..shared.frame_stim import GameFrameStim
+from ..shared.clock_sync import ClockSync
 
 
 # keyset of the MRI controller :
@@ -42,7 +45,27 @@ ACTION_ACTU_DICT = {
     "head_up": "head",
     "head_down": "head",
 }
+# channels of the actions stream sent to the robot, in order
+ACTIONS_TO_SEND = (
+    "forward",
+    "backward",
+    "left",
+    "right",
+    "head_up",
+    "head_down",
+    "lift_up",
+    "lift_down",
+    "picture",
+    "display",
+    "sound",
+)
+ACTION_CHANNELS = {action: i for i, action in enumerate(ACTIONS_TO_SEND)}
+# the sender also wakes up at this interval to check if the task is done
+SEND_CHECK_INTERVAL = 0.1
+
 COZMO_FPS = 15.0
+COZMO_FRAME_SHAPE = (240, 320, 3)
+JPEG_SOI = b"\xff\xd8"
 
 _keyPressBuffer = []
 _keyReleaseBuffer = []
@@ -64,6 +87,26 @@ def _onPygletKeyRelease(symbol, modifier):
     _keyReleaseBuffer.append((key, keyTime))
 
 
+def _frame_payload(sample):
+    """Frame bytes from an image stream sample.
+
+    Frames are sent in a string channel as the repr of a bytes object,
+    escape_decode is the C inverse of that repr (once stripped of b'').
+    """
+    return codecs.escape_decode(sample[0][2:-1])[0]
+
+
+def _decode_frame(payload):
+    """RGB uint8 frame, top row first, from raw RGB or JPEG bytes."""
+    if payload[:2] == JPEG_SOI:
+        frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        # OpenCV stores images in B G R ordering
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return np.frombuffer(payload, dtype=np.uint8).reshape(COZMO_FRAME_SHAPE)
+
+
 # ----------------------------------------------------------------- #
 #                       Cozmo Abstract Task                         #
 # ----------------------------------------------------------------- #
@@ -395,19 +438,10 @@ class CozmoFriends(CozmoBaseTask):
     ):
         super().__init__(name=name, **kwargs)
         self.max_duration = max_duration
-        self.actions_to_send = {
-            "forward": False,
-            "backward": False,
-            "left": False,
-            "right": False,
-            "head_up": False,
-            "head_down": False,
-            "lift_up": False,
-            "lift_down": False,
-            "picture": False,
-            "display": False,
-            "sound": False,
-        }
+        # state of the actions, the sender is notified when it changes
+        self.actions_to_send = np.zeros(len(ACTIONS_TO_SEND), dtype=np.uint8)
+        self._new_actions = np.zeros_like(self.actions_to_send)
+        self._actions_version = 0
         self.name = name
         self.done = False
         self.obs = None
@@ -419,11 +453,18 @@ class CozmoFriends(CozmoBaseTask):
         self.thread_send = threading.Thread(
             target=self.send_loop, args=(source_id_actions,)
         )
-        self.lock_send = threading.Lock()
+        self.cond_send = threading.Condition()
         self.thread_recv_obs = threading.Thread(
             target=self.recv_loop_obs, args=(source_id_imgs,)
         )
         self.lock_recv_obs = threading.Lock()
+        # received frames are recorded and decoded out of the receiving thread
+        self._obs_queue = queue.Queue()
+        # frames recorded but not decoded, a newer one was already received
+        self.n_skipped_frames = 0
+        self.thread_decode_obs = threading.Thread(target=self.decode_loop_obs)
+        # maps LSL timestamps of the robot streams to psychopy time
+        self._lsl_sync = None
         self.thread_recv_pos = threading.Thread(
             target=self.recv_loop_pos, args=(source_id_pos,)
         )
@@ -483,6 +524,9 @@ class CozmoFriends(CozmoBaseTask):
         self.stream = self.container.add_stream(codec_name="mjpeg", rate=15)
         self.stream.pix_fmt = "yuvj422p"
 
+        self._lsl_sync = ClockSync(lsl_local_clock, name="lsl_clock_sync")
+        self._lsl_sync.start()
+        self.thread_decode_obs.start()
         self.thread_recv_obs.start()
         self.thread_recv_pos.start()
 
@@ -509,6 +553,24 @@ class CozmoFriends(CozmoBaseTask):
         self.target_img_size = (0.3, 0.5)
         super()._setup(exp_win)
 
+    def _set_camera_feed_stim(self, exp_win):
+        frame_height, frame_width = self._first_frame.shape[:2]
+        min_ratio = min(
+            exp_win.size[0] / frame_width,
+            exp_win.size[1] / frame_height,
+        )
+        width = int(min_ratio * frame_width)
+        height = int(min_ratio * frame_height)
+
+        # frames are uploaded in place to a persistent texture
+        self.game_vis_stim = GameFrameStim(
+            exp_win,
+            frame_shape=self._first_frame.shape,
+            size=(width, height),
+            interpolate=True,
+        )
+        self.game_vis_stim.set_frame(self._first_frame)
+
     def _run(self, exp_win, *args, **kwargs):
         self.run_started = True
         self._set_key_handler(exp_win)
@@ -594,16 +656,21 @@ class CozmoFriends(CozmoBaseTask):
                 self.done = True
 
     def _stop(self, exp_win, ctl_win):
-        self.lock_send.acquire()
-        self.actions_to_send = dict.fromkeys(self.actions_to_send, False)
-        self.lock_send.release()
+        self._new_actions[:] = 0
+        self._update_actions_to_send()
         cv2.destroyAllWindows()
-        self.done = True
+        with self.cond_send:
+            self.done = True
+            self.cond_send.notify()
         self.thread_recv_pos.join()
         self.thread_recv_obs.join()
+        self.thread_decode_obs.join()
+        logging.exp(f"robot: {self.n_skipped_frames} frames recorded without being decoded")
         time.sleep(0.01)  # wait for action to be sent (to stop the robot)
         self.thread_send.join()
+        self._lsl_sync.stop()
         self.container.close()
+        self.game_vis_stim.release()
 
         # save timestamp arrays and positions
         pycozmo_ts_fname = self._generate_unique_filename("timestamp-pycozmo", "npy")
@@ -718,7 +785,8 @@ class CozmoFriends(CozmoBaseTask):
                 pos=(0.7, -0.8),
             )
             self.curr_obs_id = obs[0]
-            self.game_vis_stim.image = obs[1]
+            if new_obs:
+                self.game_vis_stim.set_frame(obs[1])
             self.game_vis_stim.draw(exp_win)
             self.target_imgstim.draw(exp_win)
             n_target_stim.draw(exp_win)
@@ -767,19 +835,25 @@ class CozmoFriends(CozmoBaseTask):
 
     def get_actions(self, exp_win):
         self._handle_controller_presses(exp_win)
-        actions_to_send = dict.fromkeys(self.actions_to_send, False)  # reset to False
+        self._new_actions[:] = 0  # reset to False
         actions_list = []
         for key in self.pressed_keys:
             if key in self.key_actions:
-                if self.key_actions[key] in actions_to_send:
-                    actions_to_send[self.key_actions[key]] = True
-                actions_list.append(self.key_actions[key])
-
-        self.lock_send.acquire()
-        self.actions_to_send = copy.deepcopy(actions_to_send)
-        self.lock_send.release()
+                action = self.key_actions[key]
+                if action in ACTION_CHANNELS:
+                    self._new_actions[ACTION_CHANNELS[action]] = 1
+                actions_list.append(action)
+        self._update_actions_to_send()
         return actions_list
 
+    def _update_actions_to_send(self):
+        # only wake the sender when the state of the actions changed
+        with self.cond_send:
+            if not np.array_equal(self._new_actions, self.actions_to_send):
+                self.actions_to_send[:] = self._new_actions
+                self._actions_version += 1
+                self.cond_send.notify()
+
     def save_mjpeg(self, id, buffer):
         packet = av.packet.Packet(buffer)
         packet.stream = self.stream
@@ -799,34 +873,54 @@ class CozmoFriends(CozmoBaseTask):
         return obs_tmp
 
     def recv_loop_obs(self, source_id):
-        streams = resolve_byprop("source_id", source_id, timeout=300)
-        if not streams:
-            raise RuntimeError(f"Stream of id {source_id} not found.")
-        inlet = StreamInlet(streams[0], processing_flags=1)
-        id = 0
-        print("Found image stream.")
-        while not self.done:
-            data, nuc_ts = inlet.pull_sample()
-            obs = literal_eval(data[0])
-            self.obs = (
-                id,
-                Image.frombytes(mode="RGB", size=(320, 240), data=obs).transpose(
-                    Image.FLIP_TOP_BOTTOM
-                ),
-            )
-            pycozmo_ts = data[1]
-            self.save_mjpeg(id, obs)
+        try:
+            streams = resolve_byprop("source_id", source_id, timeout=300)
+            if not streams:
+                raise RuntimeError(f"Stream of id {source_id} not found.")
+            inlet = StreamInlet(streams[0], processing_flags=1)
+            id = 0
+            print("Found image stream.")
+            while not self.done:
+                data, nuc_ts = inlet.pull_sample()
+                self._obs_queue.put((id, _frame_payload(data)))
+                pycozmo_ts = data[1]
+                if self.run_started:
+                    self.frame_timestamps_pycozmo.append([id, float(pycozmo_ts)])
+                    self.frame_timestamps_nuc.append([id, self._lsl_to_task_time(nuc_ts)])
+                    id += 1
+        finally:
+            # stop the decoding thread
+            self._obs_queue.put(None)
+
+    def _lsl_to_task_time(self, lsl_timestamp):
+        return self._lsl_sync.to_local(lsl_timestamp) - self.task_timer._timeAtLastReset
+
+    def decode_loop_obs(self):
+        stopping = False
+        while not stopping:
+            # every frame received is recorded, only the newest one is decoded and shown
+            items = [self._obs_queue.get()]
+            while True:
+                try:
+                    items.append(self._obs_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in items:
+                stopping = True
+                items = items[:items.index(None)]
+            if not items:
+                continue
+            for id, payload in items:
+                self.save_mjpeg(id, payload)
+            self.n_skipped_frames += len(items) - 1
+            id, payload = items[-1]
+            frame = _decode_frame(payload)
+            if frame is None:
+                continue
             self.lock_recv_obs.acquire()
+            self.obs = (id, frame)
             self.new_obs = True
             self.lock_recv_obs.release()
-            if self.run_started:
-                # TODO ask Basile for a smarter way to sync lsl clock with task_timer
-                lsl_clock_offset = lsl_local_clock() - self.task_timer.getTime()
-                lsl_clock_offset += -self.task_timer.getTime() + lsl_local_clock()
-                lsl_clock_offset = lsl_clock_offset / 2
-                self.frame_timestamps_pycozmo.append([id, float(pycozmo_ts)])
-                self.frame_timestamps_nuc.append([id, nuc_ts - lsl_clock_offset])
-                id += 1
 
     def recv_loop_pos(self, source_id):
         streams = resolve_byprop("source_id", source_id, timeout=300)
@@ -838,15 +932,11 @@ class CozmoFriends(CozmoBaseTask):
             pos, timestamp = inlet.pull_sample()
             if self.run_started:
                 recv_ts = self.task_timer.getTime()
-                # TODO ask Basile for a smarter way to sync lsl clock with task_timer
-                lsl_clock_offset = lsl_local_clock() - self.task_timer.getTime()
-                lsl_clock_offset += -self.task_timer.getTime() + lsl_local_clock()
-                lsl_clock_offset = lsl_clock_offset / 2
             pos = np.array(pos, dtype=np.float32)
             self.lock_recv_pos.acquire()
             self.robot_pos = pos
             if self.run_started:
-                self.robot_pos_ts = timestamp - lsl_clock_offset
+                self.robot_pos_ts = self._lsl_to_task_time(timestamp)
             self.lock_recv_pos.release()
             if self.run_started:
                 self.positions_log.append([pos[0], pos[1], self.robot_pos_ts, recv_ts])
@@ -855,18 +945,25 @@ class CozmoFriends(CozmoBaseTask):
         info = StreamInfo(
             name="cozmofriends",
             type="cozmo_actions",
-            channel_count=11,
+            channel_count=len(ACTIONS_TO_SEND),
             channel_format="int8",
             source_id=source_id,
         )
         outlet = StreamOutlet(info)
-        previous_actions = np.zeros(11, dtype=np.uint8)
-        while not self.done:
-            self.lock_send.acquire()
-            actions_to_send = copy.deepcopy(self.actions_to_send)
-            self.lock_send.release()
-            data = np.array(list(actions_to_send.values()), dtype=np.uint8)
-            if not (data == previous_actions).all():
+        data = np.zeros(len(ACTIONS_TO_SEND), dtype=np.uint8)
+        sent_version = 0
+        done = False
+        while not done:
+            with self.cond_send:
+                self.cond_send.wait_for(
+                    lambda: self._actions_version != sent_version or self.done,
+                    timeout=SEND_CHECK_INTERVAL,
+                )
+                changed = self._actions_version != sent_version
+                if changed:
+                    data[:] = self.actions_to_send
+                    sent_version = self._actions_version
+                done = self.done
+            # push out of the lock, the render loop is not blocked by the outlet
+            if changed:
                 outlet.push_sample(data)
-                previous_actions = data
-            time.sleep(0.01)
@@ -1,10 +1,21 @@
 import os
 import tqdm
 import time
-import pandas
+from concurrent.futures import ThreadPoolExecutor
 from psychopy import logging, visual, core, event
 
-from ..shared import fmri, meg, eeg, config
+from ..shared import fmri, meg, eeg, config, event_writer, deadline
+from ..shared.telemetry import FrameTelemetry
+
+# one thread preparing the next task while the current one ends
+_prepare_executor = None
+
+
+def _get_prepare_executor():
+    global _prepare_executor
+    if _prepare_executor is None:
+        _prepare_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task_prepare")
+    return _prepare_executor
 
 
 class Task(object):
@@ -39,14 +50,21 @@ class Task(object):
         self.use_fmri = use_fmri
         self.use_meg = use_meg
         self.use_eeg = use_eeg
-        self._events = []
+        # events are journaled to disk in the background as they are logged
+        self._events = event_writer.StreamedEvents(
+            lambda: self._generate_unique_filename("events", event_writer.JOURNAL_EXT)
+        )
 
         self._exp_win_first_flip_time = None
         self._exp_win_last_flip_time = None
         self._ctl_win_last_flip_time = None
         self._task_completed = False
         self._extra_markers = 0
+        if not hasattr(self, "_frame_telemetry"):
+            self._frame_telemetry = FrameTelemetry()
+        self._frame_telemetry.reset()
 
+        self._wait_prepared()
         self._setup(exp_win)
         self._init_progress_bar()
 
@@ -65,6 +83,27 @@ class Task(object):
         if eeg.EEG_MARKERS_ON_FLIP and self.use_eeg:
             eeg.send_signal(0)
 
+    # to be overriden: CPU-only loading (files, decoding, designs) that does not need
+    # the windows, run in the background with prepare_async, GL objects go in _setup
+    def _prepare(self):
+        pass
+
+    def prepare_async(self):
+        if getattr(self, "_prepare_future", None) is None:
+            self._prepare_future = _get_prepare_executor().submit(self._prepare)
+
+    def _wait_prepared(self):
+        future = getattr(self, "_prepare_future", None)
+        self._prepare_future = None
+        if future is None:
+            self._prepare()
+            return
+        if not future.done():
+            t_start = time.perf_counter()
+            future.result()
+            logging.exp(f"task - {self}: waited {time.perf_counter() - t_start:.3f}s for prepare")
+        future.result()
+
     def _setup(self, exp_win):
         pass
 
@@ -119,9 +158,23 @@ class Task(object):
             self.progress_bar.reset()
         flip_idx = 0
 
-        for clearBuffer in self._run(exp_win, ctl_win):
+        telemetry = self._frame_telemetry
+        telemetry.reset()
+        deadline.get_waiter().reset()
+        generator_time = loop_time = 0
+        run_gen = self._run(exp_win, ctl_win)
+        while True:
+            t_gen = time.perf_counter()
+            try:
+                clearBuffer = next(run_gen)
+            except StopIteration:
+                break
+            t_loop = time.perf_counter()
+            generator_time += t_loop - t_gen
+
             # yield first to allow external draw before flip
             yield
+            loop_time += time.perf_counter() - t_loop
 
             if meg.MEG_MARKERS_ON_FLIP and self.use_meg:
                 exp_win.callOnFlip(meg.send_signal, self.flags | (flip_idx%2))
@@ -130,6 +183,13 @@ class Task(object):
 
             if clearBuffer is not None:
                 self._flip_all_windows(exp_win, ctl_win, clearBuffer)
+                telemetry.record(
+                    flip_idx,
+                    self._exp_win_last_flip_time - self._exp_win_first_flip_time,
+                    generator_time,
+                    loop_time,
+                )
+                generator_time = loop_time = 0
 
             # increment the progress bar depending on task flip rate
             if self.progress_bar:
@@ -179,8 +239,39 @@ class Task(object):
         save_events = self._save()
         if save_events is None and len(self._events):
             fname = self._generate_unique_filename("events", "tsv")
-            df = pandas.DataFrame(self._events)
-            df.to_csv(fname, sep="\t", index=False)
+            # reserve the filename before the writer thread creates it
+            open(fname, "a").close()
+            event_writer.get_writer().write_tsv(
+                fname, list(self._events), self._events.journal_fname
+            )
+            self._events.journal_fname = None
+        else:
+            # events saved by the task itself, or not at all
+            self._events.discard_journal()
+        self._save_frame_telemetry()
+        self._save_ttl()
+        if deadline.get_waiter().n_waits:
+            deadline.get_waiter().report(str(self))
+
+    def _volume_onset(self, volume):
+        # onset of an fMRI volume on the task clock, predicted from the TR if not acquired yet
+        return fmri.get_ttl_listener().volume_time(volume) - self.task_timer._timeAtLastReset
+
+    def _save_ttl(self):
+        # only tasks that were run waited for the scanner
+        if self.use_fmri and fmri.ttl_listener is not None and hasattr(self, "task_timer"):
+            fname = self._generate_unique_filename("ttl", "tsv")
+            fmri.ttl_listener.save(fname, self.task_timer._timeAtLastReset)
+
+    def _save_frame_telemetry(self):
+        # only tasks that were run have flips recorded
+        if getattr(self, "_frame_telemetry", None) and len(self._frame_telemetry):
+            fname = self._generate_unique_filename("frametimes", "npy")
+            self._frame_telemetry.save(fname)
+            logging.exp(
+                msg="task - %s: %d frames dropped"
+                % (str(self), self._frame_telemetry.n_dropped)
+            )
 
 
 class Pause(Task):
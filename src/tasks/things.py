@@ -5,6 +5,7 @@ import numpy as np
 from colorama import Fore
 
 from ..shared import config, utils
+from ..shared.image_cache import decode_image
 
 RESPONSE_KEY = "d"
 RESPONSE_TIME = 4
@@ -29,6 +30,13 @@ Press the button when you see an unrecognizable object that was generated."""
         else:
             raise ValueError("Cannot find the listed images in %s " % images_path)
 
+    def _prepare(self):
+        # decode all images, can run while the previous task ends
+        self._images = [
+            decode_image(os.path.join(self.images_path, trial["image_path"]))
+            for trial in self.design
+        ]
+
     def _setup(self, exp_win):
         self.fixation_cross = visual.ImageStim(
             exp_win,
@@ -39,12 +47,13 @@ Press the button when you see an unrecognizable object that was generated."""
 
         # preload all images
         self._stimuli = []
-        for trial in self.design:
+        for image in self._images:
             self._stimuli.append(visual.ImageStim(
-                exp_win, os.path.join(self.images_path, trial["image_path"]),
+                exp_win, image,
                 size=10,
                 units='deg',
             ))
+        del self._images
         self.trials = data.TrialHandler(self.design, 1, method="sequential")
         self.duration = len(self.design)
         self._progress_bar_refresh_rate = 2  # 2 flips per trial
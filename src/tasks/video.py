@@ -56,7 +56,7 @@ and fixate the dot whenever it appears."""
     def _setup(self, exp_win):
 
         if self._startend_fixduration > 0 or self._inmovie_fixations:
-            from ..shared.eyetracking import fixation_dot
+            from ..shared.fixation import fixation_dot
             self.fixation_dot = fixation_dot(exp_win)
             try:
                 self.fixation_image = visual.ImageStim(
@@ -180,7 +180,7 @@ and fixate the dot whenever it appears."""
                     exp_win.logOnFlip(
                         level=logging.EXP, msg="fixation offset at frame %d at %f" % (next_frame_num, time.time()) # log fix offset time
                     )
-                    self._events[-1].update({
+                    self._events.update_event(-1, {
                         'offset_frame': next_frame_num,
                         'offset_time': next_frame_time,
                     })
@@ -1,12 +1,11 @@
-import os, sys, time, queue
+import os, sys, time
 import numpy as np
-import threading
 
 from psychopy import visual, core, data, logging, event, sound, constants
 from .task_base import Task
 
 from ..shared import config, utils
-from PIL import Image
+from ..shared.frame_stim import GameFrameStim
 import retro
 
 DEFAULT_GAME_NAME = "ShinobiIIIReturnOfTheNinjaMaster-Genesis"
@@ -46,6 +45,87 @@ def _onPygletKeyRelease(symbol, modifier):
     _keyReleaseBuffer.append((key, keyTime))
 
 import sounddevice
+
+# duration of audio that can be buffered ahead of the output stream
+AUDIO_BUFFER_DURATION = 1.
+
+
+class AudioRingBuffer(object):
+    """Single-producer/single-consumer ring buffer of audio samples.
+
+    The producer (emulator loop) only advances `_write_idx` and `_flush_idx`,
+    the consumer (sounddevice callback) only advances `_read_idx`.
+    Indices grow monotonically and a plain attribute assignment is atomic in
+    CPython, so neither side takes a lock nor allocates a buffer.
+    """
+
+    def __init__(self, capacity, channels=2, dtype=np.int16):
+        self._buffer = np.zeros((capacity, channels), dtype=dtype)
+        self.capacity = capacity
+        self._write_idx = 0
+        self._read_idx = 0
+        self._flush_idx = 0
+        self.underruns = 0
+        self.overruns = 0
+        self.min_fill = capacity
+
+    @property
+    def fill(self):
+        # number of samples ready to be read, flushed samples will be skipped
+        return self._write_idx - max(self._read_idx, self._flush_idx)
+
+    @property
+    def free(self):
+        # flushed samples are only reusable once the consumer has skipped them:
+        # it might be reading them, with the flush index read before flush()
+        return self.capacity - (self._write_idx - self._read_idx)
+
+    @property
+    def fill_level(self):
+        return self.fill / self.capacity
+
+    def write(self, block):
+        # producer side
+        n = block.shape[0]
+        free = self.free
+        if n > free:
+            # drop the tail of the block rather than overwriting unread samples
+            self.overruns += 1
+            n = free
+        pos = self._write_idx % self.capacity
+        first = min(n, self.capacity - pos)
+        self._buffer[pos:pos + first] = block[:first]
+        self._buffer[:n - first] = block[first:n]
+        self._write_idx += n
+
+    def flush(self):
+        # producer side: the consumer skips everything written so far
+        self._flush_idx = self._write_idx
+
+    def read_into(self, outdata):
+        # consumer side
+        read_idx = self._read_idx
+        if self._flush_idx > read_idx:
+            read_idx = self._flush_idx
+        frames = outdata.shape[0]
+        available = self._write_idx - read_idx
+        self.min_fill = min(self.min_fill, available)
+        n = min(frames, available)
+        pos = read_idx % self.capacity
+        first = min(n, self.capacity - pos)
+        outdata[:first] = self._buffer[pos:pos + first]
+        outdata[first:n] = self._buffer[:n - first]
+        if n < frames:
+            self.underruns += 1
+            outdata[n:].fill(0)
+        self._read_idx = read_idx + n
+
+    def reset_stats(self):
+        self.underruns = 0
+        self.overruns = 0
+        self.min_fill = self.capacity
+
+
 class SoundDeviceGameBlockStream(object):
 
     def __init__(
@@ -55,70 +135,53 @@ class SoundDeviceGameBlockStream(object):
         channels=2,
         dtype=sounddevice.default.dtype[1]):
 
-        self.blocks = queue.Queue()
-        self.blocks.put(np.zeros((500,2), dtype=dtype))
-        self.lock = threading.Lock()
+        self.ring = AudioRingBuffer(
+            int(sample_rate * AUDIO_BUFFER_DURATION), channels=channels, dtype=dtype
+        )
+        self.ring.write(np.zeros((500, channels), dtype=dtype))
         self.output_stream = sounddevice.OutputStream(
             samplerate=sample_rate,
             blocksize=block_size,
             latency=0.1,
             device=None,
-            channels=2,
+            channels=channels,
             callback=self.callback,
             dtype=dtype,
             prime_output_buffers_using_stream_callback=False
             )
-        self.current_block_idx = 0
-        self.current_block = None
         self.status = constants.STOPPED
 
     def callback(self, outdata, frames, time, status):
         if self.status == constants.STOPPED:
-            return
-        if self.blocks.empty():
             outdata.fill(0)
-            logging.debug('sound queue empty')
             return
-        elif self.current_block is None:
-            with self.lock:
-                self.current_block = self.blocks.get()
-
-        out_idx = 0
-        while True:
-            current_block_len = self.current_block.shape[0]
-
-            split_idx = min(current_block_len-self.current_block_idx, frames-out_idx)
-            split_end = self.current_block_idx + split_idx
-            #print(frames,  current_block_len, out_idx, split_idx, self.current_block_idx, split_end)
-            outdata[out_idx:out_idx+split_idx] = self.current_block[self.current_block_idx:split_end]
-            out_idx += split_idx
-
-            self.current_block_idx = split_end
-            if split_end == current_block_len:
-                with self.lock:
-                    try:
-                        self.current_block = self.blocks.get(timeout=.01)
-                    except queue.Empty:
-                        logging.debug('sound queue empty')
-                self.current_block_idx = 0
-            if out_idx == frames:
-                return
+        self.ring.read_into(outdata)
 
     def put(self, block):
-        with self.lock:
-            self.blocks.put(block)
+        self.ring.write(block)
+
+    @property
+    def fill_level(self):
+        return self.ring.fill_level
 
     def play(self):
+        self.ring.reset_stats()
         self.status = constants.PLAYING
         self.output_stream.start()
 
     def stop(self):
+        was_playing = self.status == constants.PLAYING
         self.status = constants.STOPPED
         self.output_stream.stop()
         self.flush()
+        if was_playing:
+            logging.exp(
+                f"VideoGame: audio underruns {self.ring.underruns} overruns {self.ring.overruns} "
+                f"min buffered samples {self.ring.min_fill}"
+            )
 
     def flush(self):
-        self.blocks = queue.Queue()
+        self.ring.flush()
 
 class VideoGameBase(Task):
 
@@ -158,6 +221,7 @@ class VideoGameBase(Task):
         self.game_sound = SoundDeviceGameBlockStream(
             sample_rate=audio_rate,
             block_size=0,
+            channels=first_sound_chunk.shape[1],
             dtype=np.int16)
 
         min_ratio = min(
@@ -167,21 +231,19 @@ class VideoGameBase(Task):
         width = int(min_ratio * self._first_frame.shape[1] * self._scaling)
         height = int(min_ratio * self._first_frame.shape[0] * self._scaling)
 
-        self.game_vis_stim = visual.ImageStim(
+        # persistent texture updated in place from the emulator observations
+        self.game_vis_stim = GameFrameStim(
             exp_win,
+            frame_shape=self._first_frame.shape,
             size=(width, height),
-            units="pix",
             interpolate=False,
-            flipVert=True,
-            autoLog=False,
         )
-        from ..shared.eyetracking import fixation_dot
+        from ..shared.fixation import fixation_dot
         self.fixation_dot = fixation_dot(exp_win)
 
 
     def _render_graphics_sound(self, obs, sound_block, exp_win, ctl_win):
-        #giving a PIL image directly avoid a lot of useless rescaling/conversion
-        self.game_vis_stim.image = Image.fromarray(obs).transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+        self.game_vis_stim.set_frame(obs)
         self.game_vis_stim.draw(exp_win)
         if ctl_win:
             self.game_vis_stim.draw(ctl_win)
@@ -199,6 +261,7 @@ class VideoGameBase(Task):
 
     def unload(self):
         self.emulator.close()
+        self.game_vis_stim.release()
         del self.game_sound, self.fixation_dot, self.game_vis_stim
 
     def fixation_cross(self, exp_win):